@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Guild, Channel, Role, DiscordUser, Message
+from .models import Guild, Channel, Role, DiscordUser, Message, PendingReference, BackfillCheckpoint, ImportedFile, DailyRollup, AverageMessageSnapshot, AverageMessagePending, StatsGeneration, HourlyRollup, MinuteRollup
 
 # Register your models here.
 admin.site.register(Guild)
@@ -7,3 +7,12 @@ admin.site.register(Channel)
 admin.site.register(Role)
 admin.site.register(DiscordUser)
 admin.site.register(Message)
+admin.site.register(PendingReference)
+admin.site.register(BackfillCheckpoint)
+admin.site.register(ImportedFile)
+admin.site.register(DailyRollup)
+admin.site.register(AverageMessageSnapshot)
+admin.site.register(AverageMessagePending)
+admin.site.register(StatsGeneration)
+admin.site.register(HourlyRollup)
+admin.site.register(MinuteRollup)
\ No newline at end of file
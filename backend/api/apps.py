@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    # SQLite rebuilds tables for most schema changes, dropping the search triggers
+    from django.db import connections
+    from .search import ensure_sqlite_fts
+    ensure_sqlite_fts(connections[using])
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,124 @@
+from collections import Counter
+from django.db import transaction
+from .cache import bump_generation
+from .models import AverageMessagePending, AverageMessageSnapshot, Message
+
+# Character positions past this are never shown, the average message is far shorter
+MAX_CHAR_POSITIONS = 500
+MAX_WORDS = 50
+# Once a word position tracks this many distinct words, keep only the top WORD_KEEP
+WORD_PRUNE_LIMIT = 5000
+WORD_KEEP = 1000
+# A space only wins a position if at least this share of messages have one there
+SPACE_THRESHOLD = 19.8
+
+
+def _prune(counter):
+    if len(counter) > WORD_PRUNE_LIMIT:
+        kept = counter.most_common(WORD_KEEP)
+        counter.clear()
+        counter.update(dict(kept))
+
+
+def load_snapshot():
+    """The stored snapshot without refreshing it, empty before the first refresh"""
+    return AverageMessageSnapshot.objects.filter(pk=1).first() or AverageMessageSnapshot()
+
+
+def refresh_snapshot(full=False, chunk_size=2000):
+    """
+    Fold every message queued in AverageMessagePending into the histograms in one
+    streaming pass and dequeue it. ``full``, and the very first refresh, start over
+    from every message, which is also how edits and deletes get picked up.
+    """
+    with transaction.atomic():
+        snapshot, created = AverageMessageSnapshot.objects.select_for_update().get_or_create(pk=1)
+        full = full or created
+        if full:
+            snapshot.message_count = 0
+            snapshot.total_chars = 0
+            snapshot.position_totals = []
+            snapshot.char_counts = []
+            snapshot.word_counts = []
+
+        position_totals = snapshot.position_totals
+        char_counts = [Counter(counts) for counts in snapshot.char_counts]
+        word_counts = [Counter(counts) for counts in snapshot.word_counts]
+
+        messages = Message.objects.all() if full else Message.objects.filter(average_pending__isnull=False)
+        messages = messages.order_by().values_list('id', 'content')
+
+        processed = 0
+        folded = []
+        for message_id, content in messages.iterator(chunk_size=chunk_size):
+            content = (content or '').lower()
+            snapshot.message_count += 1
+            snapshot.total_chars += len(content)
+
+            chars = content[:MAX_CHAR_POSITIONS]
+            while len(position_totals) < len(chars):
+                position_totals.append(0)
+                char_counts.append(Counter())
+            for pos, char in enumerate(chars):
+                position_totals[pos] += 1
+                char_counts[pos][char] += 1
+
+            words = [w.rstrip(',.') for w in content.split()[:MAX_WORDS]]
+            while len(word_counts) < len(words):
+                word_counts.append(Counter())
+            for pos, word in enumerate(words):
+                if word:
+                    word_counts[pos][word] += 1
+
+            processed += 1
+            folded.append(message_id)
+            if len(folded) >= chunk_size:
+                for counter in word_counts:
+                    _prune(counter)
+                # Only what this pass read is dequeued, messages stored meanwhile wait for the next
+                AverageMessagePending.objects.filter(message_id__in=folded).delete()
+                folded = []
+        AverageMessagePending.objects.filter(message_id__in=folded).delete()
+
+        if processed or full:
+            for counter in word_counts:
+                _prune(counter)
+            snapshot.position_totals = position_totals
+            snapshot.char_counts = [dict(counter) for counter in char_counts]
+            snapshot.word_counts = [dict(counter) for counter in word_counts]
+            snapshot.save()
+            # Cached average message responses are keyed on the stats generation
+            bump_generation()
+
+    return snapshot, processed
+
+
+def build_average_message(snapshot):
+    """Pick the most common character and word at each position"""
+    if not snapshot.message_count:
+        return {'average_message_chars': '', 'average_message_words': ''}
+
+    avg_len = round(snapshot.total_chars / snapshot.message_count)
+    common_chars = []
+    for pos in range(min(avg_len, len(snapshot.char_counts))):
+        ranked = Counter(snapshot.char_counts[pos]).most_common(2)
+        if not ranked:
+            continue
+        char, count = ranked[0]
+        if char == ' ' and count / snapshot.position_totals[pos] * 100 < SPACE_THRESHOLD:
+            # If space doesn't meet the threshold, use the next character instead
+            if len(ranked) < 2:
+                continue
+            char = ranked[1][0]
+        common_chars.append(char)
+
+    common_words = [
+        Counter(counts).most_common(1)[0][0]
+        for counts in snapshot.word_counts[:MAX_WORDS]
+        if counts
+    ]
+
+    return {
+        'average_message_chars': ''.join(common_chars),
+        'average_message_words': ' '.join(common_words)
+    }
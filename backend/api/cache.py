@@ -0,0 +1,79 @@
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import StatsGeneration
+
+# Parameters holding comma separated lists, their order doesn't change the result
+LIST_PARAMS = ('exclude_user', 'exclude_channel', 'guild', 'channel', 'user')
+
+
+def current_generation():
+    return StatsGeneration.objects.values_list('generation', flat=True).first() or 0
+
+
+def bump_generation():
+    """Invalidate every cached stats response once the surrounding transaction commits"""
+    transaction.on_commit(_bump)
+
+
+def _bump():
+    updated = StatsGeneration.objects.filter(pk=1).update(
+        generation=F('generation') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        StatsGeneration.objects.get_or_create(pk=1, defaults={'generation': 1})
+
+
+def normalize_params(query_params):
+    """Turn query parameters into a canonical string, so equivalent requests share an entry"""
+    normalized = []
+    for key in sorted(query_params):
+        values = query_params.getlist(key)
+        if key in LIST_PARAMS:
+            values = sorted({v.strip() for value in values for v in value.split(',') if v.strip()})
+            if not values:
+                continue
+            values = [','.join(values)]
+        elif key == 'exclude_bots':
+            values = [value.lower() for value in values]
+        normalized.append(f"{key}={'&'.join(values)}")
+    return '&'.join(normalized)
+
+
+def cache_stats(get):
+    """
+    Cache a stats view's GET response per endpoint, normalized parameters and stats
+    generation. Entries also roll over every STATS_CACHE_TIMEOUT seconds, so values
+    relative to now don't go stale. Requests whose If-None-Match still matches get
+    a 304 without the view running.
+    """
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        timeout = settings.STATS_CACHE_TIMEOUT
+        window = int(time.time() // timeout) if timeout else 0
+        key = f"{request.path}?{normalize_params(request.query_params)}#{current_generation()}:{window}"
+        digest = hashlib.md5(key.encode()).hexdigest()
+        etag = f'"{digest}"'
+
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        cache_key = f"stats:{digest}"
+        data = cache.get(cache_key)
+        if data is None:
+            response = get(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(cache_key, data, timeout or None)
+
+        return Response(data, headers={'ETag': etag})
+    return wrapper
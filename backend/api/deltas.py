@@ -0,0 +1,45 @@
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import Q
+from django.utils import timezone
+from .models import Message
+
+
+class DeltaError(ValueError):
+    pass
+
+
+def parse_since(value):
+    """
+    (timestamp, message_id) position for a ``since`` parameter holding either the
+    last message ID a client has seen or an ISO 8601 timestamp (message_id is None).
+    """
+    value = value.strip()
+    row = Message.objects.filter(pk=value).values_list('timestamp', 'id').first()
+    if row:
+        return row
+    try:
+        timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise DeltaError(f'Unknown message {value}, fetch without since to start over')
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+    return timestamp, None
+
+
+def latest_position():
+    """(timestamp, id) of the newest message, or None when there are none"""
+    return Message.objects.order_by('-timestamp', '-id').values_list('timestamp', 'id').first()
+
+
+def between(queryset, since, until):
+    """
+    Messages strictly after ``since`` and up to and including ``until`` in (timestamp, id)
+    order. Bounding by the cursor handed out keeps the next poll from skipping messages
+    stored while this one ran.
+    """
+    timestamp, message_id = since
+    if message_id is None:
+        queryset = queryset.filter(timestamp__gt=timestamp)
+    else:
+        queryset = queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=message_id))
+    return queryset.filter(Q(timestamp__lt=until[0]) | Q(timestamp=until[0], id__lte=until[1]))
@@ -0,0 +1,127 @@
+import json
+import os
+import re
+
+EMOJI_FILE = os.path.join(os.path.dirname(__file__), 'emojis.json')
+TWEMOJI_URL = 'https://cdn.jsdelivr.net/gh/twitter/twemoji@latest/assets/svg/{}.svg'
+CUSTOM_EMOJI_URL = 'https://cdn.discordapp.com/emojis/{}.{}'
+
+# Variation selector 16, optional in most emoji so it's skipped while matching
+VS16 = '\ufe0f'
+ZWJ = '\u200d'
+# Skin tones and the tag characters of subdivision flags extend the emoji before them
+MODIFIERS = re.compile('[\U0001F3FB-\U0001F3FF\ufe0f\U000E0020-\U000E007F]*')
+# Marks the end of a complete emoji in the trie
+_END = None
+
+CUSTOM_EMOJI = r'<(a?):(\w{2,32}):(\d{15,25})>'
+KEYCAP = '[0-9#*]\ufe0f?\u20e3'
+
+
+def _build():
+    with open(EMOJI_FILE, encoding='utf-8') as f:
+        emojis = json.load(f)['emojis']
+
+    # Every emoji sequence (ZWJ families, flags, keycaps) as a path of code points
+    trie = {}
+    for emoji in emojis:
+        node = trie
+        for char in emoji.replace(VS16, ''):
+            node = node.setdefault(char, {})
+        node[_END] = True
+
+    # Characters an emoji can start with. Plain digits, # and * only count as part
+    # of a keycap, and the astral ones collapse into one range so the class stays
+    # a cheap test; the trie rejects whatever else falls inside that range
+    bmp = ''.join(re.escape(char) for char in sorted(trie) if ord(char) < 0x10000 and char not in '#*0123456789')
+    astral = sorted(char for char in trie if ord(char) >= 0x10000)
+    starts = f'{bmp}{astral[0]}-{astral[-1]}'
+    return trie, re.compile(f'{CUSTOM_EMOJI}|{KEYCAP}|[{starts}]')
+
+
+_TRIE, _PATTERN = _build()
+
+
+def _match_at(content, start):
+    """End of the longest emoji in the trie starting at ``start``, or None"""
+    node, end, i = _TRIE, None, start
+    while i < len(content):
+        char = content[i]
+        if char == VS16:
+            i += 1
+            if _END in node:
+                end = i
+            continue
+        node = node.get(char)
+        if node is None:
+            break
+        i += 1
+        if _END in node:
+            end = i
+    return end
+
+
+def _sequence_end(content, start):
+    """End of the whole emoji grapheme at ``start``: modifiers and ZWJ joined emoji included"""
+    end = _match_at(content, start)
+    while end is not None:
+        end = MODIFIERS.match(content, end).end()
+        if not content.startswith(ZWJ, end):
+            break
+        joined = _match_at(content, end + 1)
+        if joined is None:
+            break
+        end = joined
+    return end
+
+
+def twemoji_code(emoji):
+    """Twemoji file name, which leaves out VS16 unless the sequence has a ZWJ"""
+    if ZWJ not in emoji:
+        emoji = emoji.replace(VS16, '')
+    return '-'.join(format(ord(char), 'x') for char in emoji)
+
+
+def extract_emojis(content):
+    """
+    Unicode and custom emojis in ``content``, in order, in the inline_emojis format.
+
+    Runs in time linear in the length of the content: the regex only stops at
+    characters that can start an emoji, and from there the longest sequence is
+    followed through a trie of at most a few code points. Skin tones, ZWJ
+    sequences, flags and keycaps come out as one emoji each.
+    """
+    found = []
+    if not content:
+        return found
+    pos = 0
+    while True:
+        match = _PATTERN.search(content, pos)
+        if match is None:
+            return found
+        if match.group(3):
+            animated, name, emoji_id = match.groups()
+            found.append({
+                'id': emoji_id,
+                'name': name,
+                'code': None,
+                'isAnimated': bool(animated),
+                'imageUrl': CUSTOM_EMOJI_URL.format(emoji_id, 'gif' if animated else 'png')
+            })
+            pos = match.end()
+            continue
+
+        end = _sequence_end(content, match.start())
+        if end is None:
+            pos = match.start() + 1
+            continue
+        emoji = content[match.start():end]
+        code = twemoji_code(emoji)
+        found.append({
+            'id': '',
+            'name': emoji,
+            'code': code,
+            'isAnimated': False,
+            'imageUrl': TWEMOJI_URL.format(code)
+        })
+        pos = end
@@ -0,0 +1,183 @@
+import csv
+import gzip
+import io
+import json
+import os
+from django.db.models import Q
+from .models import Message
+
+FORMATS = ('txt', 'jsonl', 'csv', 'parquet')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+WRITE_BUFFER = 1 << 20
+
+COLUMNS = (
+    'id', 'timestamp', 'guild_id', 'channel_id', 'channel_name', 'author_id', 'author_name',
+    'is_bot', 'content', 'word_count', 'char_count', 'has_attachment', 'has_mention', 'has_emoji'
+)
+VALUES = {
+    'channel_name': 'channel__name',
+    'author_name': 'author__name',
+    'is_bot': 'author__is_bot',
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def build_queryset(channel_ids=None, exclude_channel_ids=None, author_ids=None, exclude_author_ids=None,
+                   include_bots=False, include_empty=False, exclude_prefixes=(), since=None, until=None):
+    """Messages matching the export filters, all of which are on indexed columns except the prefixes"""
+    messages = Message.objects.all()
+    if channel_ids is not None:
+        messages = messages.filter(channel_id__in=channel_ids)
+    if exclude_channel_ids:
+        messages = messages.exclude(channel_id__in=exclude_channel_ids)
+    if author_ids is not None:
+        messages = messages.filter(author_id__in=author_ids)
+    if exclude_author_ids:
+        messages = messages.exclude(author_id__in=exclude_author_ids)
+    if not include_bots:
+        messages = messages.filter(author__is_bot=False)
+    if not include_empty:
+        messages = messages.exclude(content='')
+    for prefix in exclude_prefixes:
+        messages = messages.exclude(content__istartswith=prefix)
+    if since:
+        messages = messages.filter(timestamp__gte=since)
+    if until:
+        messages = messages.filter(timestamp__lt=until)
+    return messages
+
+
+def iter_rows(queryset, batch_size=10000):
+    """
+    Yield export rows in (timestamp, id) order, one keyset page at a time.
+
+    Every page continues after the last row of the previous one instead of using
+    OFFSET, so memory is bounded by ``batch_size`` and each page costs the same.
+    """
+    fields = [VALUES.get(column, column) for column in COLUMNS]
+    last = None
+    while True:
+        page = queryset
+        if last:
+            page = page.filter(Q(timestamp__gt=last[0]) | Q(timestamp=last[0], id__gt=last[1]))
+        rows = list(page.order_by('timestamp', 'id').values_list(*fields)[:batch_size])
+        for row in rows:
+            yield dict(zip(COLUMNS, row))
+        if len(rows) < batch_size:
+            return
+        last = (rows[-1][1], rows[-1][0])
+
+
+def open_output(path, compression='none'):
+    """Buffered text stream for ``path``, compressed on the fly if asked to"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if compression == 'gzip':
+        raw = gzip.open(path, 'wb', compresslevel=6)
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ExportError('zstd compression needs the zstandard package (pip install zstandard)')
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+    else:
+        raw = open(path, 'wb')
+    return io.TextIOWrapper(io.BufferedWriter(raw, WRITE_BUFFER), encoding='utf-8', newline='')
+
+
+def write_txt(rows, f):
+    count = 0
+    for row in rows:
+        f.write(f"[{row['author_name']}] {row['content']}\n")
+        count += 1
+    return count
+
+
+def write_jsonl(rows, f):
+    count = 0
+    for row in rows:
+        row['timestamp'] = row['timestamp'].isoformat()
+        f.write(json.dumps(row, ensure_ascii=False))
+        f.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, f):
+    writer = csv.DictWriter(f, fieldnames=COLUMNS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        row['timestamp'] = row['timestamp'].isoformat()
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_parquet(rows, path, compression='none', row_group_size=50000):
+    """Columnar export, written one row group at a time so memory stays bounded"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('Parquet export needs the pyarrow package (pip install pyarrow)')
+
+    schema = pa.schema([
+        ('id', pa.string()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('guild_id', pa.string()),
+        ('channel_id', pa.string()),
+        ('channel_name', pa.string()),
+        ('author_id', pa.string()),
+        ('author_name', pa.string()),
+        ('is_bot', pa.bool_()),
+        ('content', pa.string()),
+        ('word_count', pa.int32()),
+        ('char_count', pa.int32()),
+        ('has_attachment', pa.bool_()),
+        ('has_mention', pa.bool_()),
+        ('has_emoji', pa.bool_()),
+    ])
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Parquet compresses per column chunk, so the codec goes inside the file
+    codec = {'none': 'NONE', 'gzip': 'GZIP', 'zstd': 'ZSTD'}[compression]
+
+    count = 0
+    columns = {column: [] for column in COLUMNS}
+    with pq.ParquetWriter(path, schema, compression=codec) as writer:
+        for row in rows:
+            for column in COLUMNS:
+                columns[column].append(row[column])
+            count += 1
+            if len(columns['id']) >= row_group_size:
+                writer.write_table(pa.table(columns, schema=schema))
+                columns = {column: [] for column in COLUMNS}
+        if columns['id']:
+            writer.write_table(pa.table(columns, schema=schema))
+    return count
+
+
+def output_path(path, fmt, compression):
+    """``path`` with the compression suffix added for the streamed formats"""
+    if fmt != 'parquet' and compression != 'none' and not path.endswith(EXTENSIONS[compression]):
+        path += EXTENSIONS[compression]
+    return path
+
+
+def export(queryset, path, fmt='txt', compression='none', batch_size=10000):
+    """Write every message in ``queryset`` to ``path``, returns the number of messages written"""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt}, expected one of {', '.join(FORMATS)}")
+    if compression not in COMPRESSIONS:
+        raise ExportError(f"Unknown compression {compression}, expected one of {', '.join(COMPRESSIONS)}")
+
+    rows = iter_rows(queryset, batch_size)
+    if fmt == 'parquet':
+        return write_parquet(rows, path, compression)
+
+    writer = {'txt': write_txt, 'jsonl': write_jsonl, 'csv': write_csv}[fmt]
+    with open_output(path, compression) as f:
+        return writer(rows, f)
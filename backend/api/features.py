@@ -0,0 +1,68 @@
+"""
+Text features derived from message content, computed once when a message is stored.
+
+Each feature is a function of the content registered with the columns it returns.
+Message.set_derived_fields() runs all of them, so ingestion, save() and the
+update_message_counts backfill share one definition; views read the columns.
+Adding a feature means registering it here and adding its columns to Message.
+"""
+import re
+from django.conf import settings
+
+FEATURES = []
+
+# One token per word in space separated scripts, one per character in scripts written
+# without spaces (CJK ideographs, kana), so counts compare across languages
+UNSPACED = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+TOKEN = re.compile(rf'[{UNSPACED}]|[^\W_{UNSPACED}]+')
+URL = re.compile(r'https?://\S+', re.IGNORECASE)
+CODE_BLOCK = re.compile(r'```.*?```', re.DOTALL)
+# A prefix bots on the server answer to, directly followed by a command name that ends
+# the word, so paths like /r/python don't count
+COMMAND = re.compile(rf'^[{re.escape(settings.COMMAND_PREFIXES)}][^\W\d_]\w*(?!\S)')
+
+
+def feature(*columns):
+    """Register a function computing ``columns`` from message content"""
+    def register(func):
+        FEATURES.append((columns, func))
+        return func
+    return register
+
+
+@feature('word_count', 'char_count')
+def text_lengths(content):
+    return {'word_count': len(content.split()), 'char_count': len(content)}
+
+
+@feature('token_count', 'unique_token_count')
+def tokens(content):
+    found = [token.casefold() for token in TOKEN.findall(content)]
+    return {'token_count': len(found), 'unique_token_count': len(set(found))}
+
+
+@feature('url_count')
+def urls(content):
+    return {'url_count': len(URL.findall(content))}
+
+
+@feature('code_block_count')
+def code_blocks(content):
+    return {'code_block_count': len(CODE_BLOCK.findall(content))}
+
+
+@feature('is_command')
+def command(content):
+    return {'is_command': bool(COMMAND.match(content.lstrip()))}
+
+
+FEATURE_FIELDS = tuple(column for columns, _ in FEATURES for column in columns)
+
+
+def extract_features(content):
+    """Every registered feature of ``content`` as a column -> value dict"""
+    content = content or ''
+    values = {}
+    for _, func in FEATURES:
+        values.update(func(content))
+    return values
@@ -0,0 +1,220 @@
+import hashlib
+import json
+from datetime import datetime
+from .ingest import store_batch
+
+READ_SIZE = 1 << 20
+_decoder = json.JSONDecoder()
+
+
+class ExportReader:
+    """
+    Incremental reader for DiscordChatExporter JSON files.
+
+    Only the value currently being decoded is held in memory, so the size of
+    the ``messages`` array does not matter. Iterating yields ``(key, value)``
+    for every top-level key, and ``('message', msg)`` for each element of
+    ``messages``.
+    """
+
+    def __init__(self, fp, read_size=READ_SIZE):
+        self.fp = fp
+        self.read_size = read_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.fp.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has already been consumed before growing the buffer
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON export')
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} but found '{self.buffer[self.pos]}'")
+        self.pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number cut off by the chunk boundary would still decode, so make sure it ended
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def __iter__(self):
+        self._expect('{')
+        while self._peek() != '}':
+            key = self._value()
+            self._expect(':')
+            if key == 'messages':
+                self._expect('[')
+                while self._peek() != ']':
+                    yield 'message', self._value()
+                    if self._peek() == ',':
+                        self.pos += 1
+                self.pos += 1
+            else:
+                yield key, self._value()
+            if self._peek() == ',':
+                self.pos += 1
+        self.pos += 1
+
+
+def file_checksum(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def build_reactions(reactions_data):
+    """Process reactions into the dict stored on the message"""
+    reactions_dict = {}
+    for reaction in reactions_data or []:
+        emoji = reaction.get('emoji', {})
+        if isinstance(emoji, str):
+            emoji_key = emoji
+            emoji_data = {
+                'name': emoji,
+                'code': emoji,
+                'count': reaction.get('count', 1)
+            }
+        else:
+            emoji_key = f"{emoji.get('id', '')}:{emoji.get('name', '')}"
+            emoji_data = {
+                'id': emoji.get('id'),
+                'name': emoji.get('name', ''),
+                'code': emoji.get('code', ''),
+                'is_animated': emoji.get('isAnimated', False),
+                'image_url': emoji.get('imageUrl'),
+                'count': reaction.get('count', 1)
+            }
+        reactions_dict[emoji_key] = emoji_data
+    return reactions_dict
+
+
+def build_record(msg, guild, channel):
+    """Convert one exported message into an api.ingest record"""
+    author = msg['author']
+    return {
+        'guild': guild,
+        'channel': channel,
+        'author': {
+            'id': str(author['id']),
+            'name': author['name'],
+            'discriminator': author.get('discriminator'),
+            'nickname': author.get('nickname'),
+            'avatar_url': author.get('avatarUrl'),
+            'color': author.get('color'),
+            'is_bot': author.get('isBot', False),
+            'roles': [{
+                'id': str(role['id']),
+                'name': role['name'],
+                'color': role.get('color'),
+                'position': role.get('position', 0)
+            } for role in author.get('roles', [])] or None
+        },
+        'message': {
+            'id': str(msg['id']),
+            'type': msg['type'],
+            'content': msg.get('content') or '',
+            'timestamp': parse_timestamp(msg['timestamp']),
+            'timestamp_edited': parse_timestamp(msg.get('timestampEdited')),
+            'call_ended': parse_timestamp(msg.get('callEndedTimestamp')),
+            'is_pinned': msg.get('isPinned', False),
+            'reference_id': (msg.get('reference') or {}).get('messageId'),
+            'reactions': build_reactions(msg.get('reactions')),
+            'attachments': msg.get('attachments', []),
+            'embeds': msg.get('embeds', []),
+            'stickers': msg.get('stickers', []),
+            'mentions': msg.get('mentions', []),
+            'inline_emojis': msg.get('inlineEmojis', [])
+        }
+    }
+
+
+def import_file(path, chunk_size=1000, should_stop=None, on_chunk=None):
+    """
+    Stream one export file into the database in chunks of ``chunk_size`` messages.
+
+    ``should_stop`` is polled between chunks, ``on_chunk(stored, skipped)`` is called
+    after every stored chunk. Returns a dict of ``messages``, ``skipped``, ``errors``
+    and ``stopped``.
+    """
+    result = {'messages': 0, 'skipped': 0, 'errors': [], 'stopped': False}
+    header = {}
+    guild = channel = None
+    records = []
+
+    def flush():
+        stored = store_batch(records, update_existing=False)
+        result['messages'] += stored['inserted']
+        result['skipped'] += stored['skipped']
+        if on_chunk:
+            on_chunk(stored['inserted'], stored['skipped'])
+        records.clear()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for key, value in ExportReader(f):
+            if key != 'message':
+                header[key] = value
+                continue
+
+            # The exporter writes guild and channel before the messages array
+            if channel is None:
+                guild = {
+                    'id': str(header['guild']['id']),
+                    'name': header['guild']['name'],
+                    'icon_url': header['guild'].get('iconUrl')
+                }
+                channel = {
+                    'id': str(header['channel']['id']),
+                    'name': header['channel']['name'],
+                    'type': header['channel']['type'],
+                    'category_id': header['channel'].get('categoryId'),
+                    'category_name': header['channel'].get('category'),
+                    'topic': header['channel'].get('topic')
+                }
+
+            try:
+                records.append(build_record(value, guild, channel))
+            except Exception as e:
+                result['errors'].append(f"Error processing message {value.get('id', 'unknown')}: {str(e)}")
+
+            if len(records) >= chunk_size:
+                flush()
+                if should_stop and should_stop():
+                    result['stopped'] = True
+                    return result
+
+    if records:
+        flush()
+    return result
@@ -0,0 +1,338 @@
+"""
+Bulk write path shared by the bot's live ingestion, channel backfills and JSON imports.
+
+Callers hand over plain dict records shaped like::
+
+    {
+        'guild': {'id', 'name', 'icon_url'},
+        'channel': {'id', 'name', 'type', 'category_id', 'category_name', 'topic'},
+        'author': {'id', 'name', 'discriminator', 'nickname', 'avatar_url', 'color', 'is_bot',
+                   'roles': [{'id', 'name', 'color', 'position'}] or None},
+        'message': {'id', 'type', 'content', 'timestamp', 'timestamp_edited', 'call_ended',
+                    'is_pinned', 'reference_id', 'reactions', 'attachments', 'embeds',
+                    'stickers', 'mentions', 'inline_emojis'},
+    }
+
+and ``store_batch`` upserts the whole batch in one transaction with a fixed number of
+queries, independent of how many messages, users or roles it contains.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import (
+    Guild, Channel, DiscordUser, Role, Message, PendingReference, BackfillCheckpoint, AverageMessagePending
+)
+from .rollups import RollupDeltas
+from .cache import bump_generation
+
+GUILD_FIELDS = ['name', 'icon_url']
+CHANNEL_FIELDS = ['guild', 'name', 'type', 'category_id', 'category_name', 'topic']
+USER_FIELDS = ['name', 'discriminator', 'nickname', 'avatar_url', 'color']
+ROLE_FIELDS = ['guild', 'name', 'color', 'position']
+
+
+def _upsert(model, objs, update_fields, update_existing):
+    """Write ``objs``, returns whether any row was inserted or updated"""
+    if not objs:
+        return False
+    if update_existing:
+        model.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=update_fields
+        )
+        return True
+    return bool(_insert_new(model, objs))
+
+
+def _insert_new(model, objs):
+    """
+    Insert ``objs`` skipping rows that already exist, and return the primary keys that
+    were actually inserted. The database reports them (ON CONFLICT DO NOTHING RETURNING),
+    so when several writers store the same rows concurrently each one only sees its own.
+    Rows go in primary key order, so overlapping batches wait on each other instead of
+    deadlocking.
+    """
+    if not objs:
+        return set()
+    opts = model._meta
+    fields = opts.concrete_fields
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in fields)
+    row = f"({', '.join(['%s'] * len(fields))})"
+    objs = sorted(objs, key=lambda obj: obj.pk)
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+
+    inserted = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {quote(opts.db_table)} ({columns}) VALUES {', '.join([row] * len(batch))} "
+                f"ON CONFLICT ({quote(opts.pk.column)}) DO NOTHING RETURNING {quote(opts.pk.column)}",
+                [field.get_db_prep_save(field.pre_save(obj, True), connection) for obj in batch for field in fields]
+            )
+            inserted.update(pk for pk, in cursor.fetchall())
+    return inserted
+
+
+def _adjust_totals(model, deltas):
+    """
+    Add ``{pk: [messages, words, characters]}`` deltas to the stored totals of ``model``
+    in one UPDATE. The rows are locked in primary key order first, so concurrent
+    batches touching the same channels or users queue up instead of deadlocking.
+    """
+    if not deltas:
+        return
+    pks = sorted(deltas)
+    list(model.objects.select_for_update().filter(pk__in=pks).order_by('pk').values_list('pk', flat=True))
+
+    def plus(column, index):
+        return models.F(column) + models.Case(
+            *[models.When(pk=pk, then=models.Value(deltas[pk][index])) for pk in pks],
+            default=models.Value(0)
+        )
+    model.objects.filter(pk__in=pks).update(
+        total_messages=plus('total_messages', 0),
+        total_words=plus('total_words', 1),
+        total_characters=plus('total_characters', 2)
+    )
+
+
+def fingerprint(obj, fields, *extra):
+    """Hashable snapshot of the columns an upsert would write"""
+    return tuple(getattr(obj, obj._meta.get_field(f).attname) for f in fields) + extra
+
+
+def _drop_unchanged(cache, kind, objs, fields, extras=None):
+    """Filter out entities the cache has already seen written with identical values"""
+    changed = {}
+    for pk, obj in objs.items():
+        snapshot = fingerprint(obj, fields, *(extras or {}).get(pk, ()))
+        if not cache.unchanged(kind, pk, snapshot):
+            changed[pk] = (obj, snapshot)
+    return changed
+
+
+def build_message(record):
+    """Build an unsaved Message with the same derived fields Message.save() would set"""
+    data = record['message']
+    message = Message(
+        id=str(data['id']),
+        guild_id=str(record['guild']['id']),
+        channel_id=str(record['channel']['id']),
+        author_id=str(record['author']['id']),
+        type=data.get('type') or 'Default',
+        content=data.get('content') or '',
+        timestamp=data['timestamp'],
+        timestamp_edited=data.get('timestamp_edited'),
+        call_ended=data.get('call_ended'),
+        is_pinned=data.get('is_pinned', False),
+        reactions=data.get('reactions') or {},
+        attachments=data.get('attachments') or [],
+        embeds=data.get('embeds') or [],
+        stickers=data.get('stickers') or [],
+        mentions=data.get('mentions') or [],
+        inline_emojis=data.get('inline_emojis') or [],
+    )
+    message.set_derived_fields()
+    return message
+
+
+def resolve_pending_references(parent_ids):
+    """Link replies that were stored before any of ``parent_ids`` arrived"""
+    waiting = PendingReference.objects.filter(reference_id__in=list(parent_ids))
+    if not waiting.exists():
+        return 0
+    linked = Message.objects.filter(pending_reference__in=waiting).update(
+        reference_message_id=Subquery(
+            PendingReference.objects.filter(message_id=OuterRef('pk')).values('reference_id')[:1]
+        )
+    )
+    waiting.delete()
+    return linked
+
+
+def prune_pending_references():
+    """
+    Delete pending references older than PENDING_REFERENCE_RETENTION_DAYS, whose parent
+    was deleted or never exported. Returns the number of rows removed.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.PENDING_REFERENCE_RETENTION_DAYS)
+    deleted, _ = PendingReference.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def store_batch(records, update_existing=True, cache=None):
+    """
+    Persist a batch of message records.
+
+    Guilds, channels, users and roles are upserted (or only inserted when
+    ``update_existing`` is False, e.g. for historical imports that must not overwrite
+    current metadata). Messages that already exist are skipped. Returns a dict with
+    the number of ``inserted`` and ``skipped`` messages.
+
+    ``cache`` is an optional object with ``unchanged(kind, pk, fingerprint)`` and
+    ``remember(kind, pk, fingerprint)``; entities it reports as unchanged are not
+    written at all, and everything written is remembered once the batch commits.
+    """
+    guilds, channels, users, roles = {}, {}, {}, {}
+    user_roles = {}
+    messages = {}
+
+    # Later records win for metadata, the first copy of a message wins
+    for record in records:
+        guild_id = str(record['guild']['id'])
+        guilds[guild_id] = Guild(id=guild_id, **{f: record['guild'].get(f) for f in GUILD_FIELDS})
+
+        channel = record['channel']
+        channels[str(channel['id'])] = Channel(
+            id=str(channel['id']),
+            guild_id=guild_id,
+            name=channel.get('name') or 'Unknown',
+            type=channel.get('type') or 'text',
+            category_id=channel.get('category_id'),
+            category_name=channel.get('category_name'),
+            topic=channel.get('topic'),
+        )
+
+        author = record['author']
+        author_id = str(author['id'])
+        users[author_id] = DiscordUser(
+            id=author_id,
+            name=author['name'],
+            discriminator=author.get('discriminator') or '0000',
+            nickname=author.get('nickname'),
+            avatar_url=author.get('avatar_url'),
+            color=author.get('color'),
+            is_bot=author.get('is_bot', False),
+        )
+        if author.get('roles') is not None:
+            user_roles[author_id] = set()
+            for role in author['roles']:
+                role_id = str(role['id'])
+                roles[role_id] = Role(
+                    id=role_id,
+                    guild_id=guild_id,
+                    name=role['name'],
+                    color=role.get('color'),
+                    position=role.get('position') or 0,
+                )
+                user_roles[author_id].add(role_id)
+
+        message = build_message(record)
+        messages.setdefault(message.id, (message, record['message'].get('reference_id')))
+
+    bots = {pk for pk, user in users.items() if user.is_bot}
+
+    if cache is not None:
+        written = {
+            'guild': _drop_unchanged(cache, 'guild', guilds, GUILD_FIELDS),
+            'channel': _drop_unchanged(cache, 'channel', channels, CHANNEL_FIELDS),
+            'user': _drop_unchanged(cache, 'user', users, USER_FIELDS, {
+                pk: (tuple(sorted(user_roles[pk])) if pk in user_roles else None,)
+                for pk in users
+            }),
+            'role': _drop_unchanged(cache, 'role', roles, ROLE_FIELDS),
+        }
+        guilds, channels, users, roles = (
+            {pk: obj for pk, (obj, _) in written[kind].items()}
+            for kind in ('guild', 'channel', 'user', 'role')
+        )
+        user_roles = {pk: role_ids for pk, role_ids in user_roles.items() if pk in users}
+
+    with transaction.atomic():
+        entities_written = any([
+            _upsert(Guild, list(guilds.values()), GUILD_FIELDS, update_existing),
+            _upsert(Channel, list(channels.values()), CHANNEL_FIELDS, update_existing),
+            _upsert(DiscordUser, list(users.values()), USER_FIELDS, update_existing),
+        ])
+        _upsert(Role, list(roles.values()), ROLE_FIELDS, update_existing)
+
+        if cache is not None:
+            def remember():
+                for kind, entries in written.items():
+                    for pk, (_, snapshot) in entries.items():
+                        cache.remember(kind, pk, snapshot)
+            transaction.on_commit(remember)
+
+        if user_roles:
+            through = DiscordUser.roles.through
+            if update_existing:
+                through.objects.filter(discorduser_id__in=list(user_roles)).delete()
+            through.objects.bulk_create([
+                through(discorduser_id=user_id, role_id=role_id)
+                for user_id, role_ids in user_roles.items()
+                for role_id in role_ids
+            ], ignore_conflicts=True)
+
+        existing = set(
+            Message.objects.filter(id__in=list(messages)).values_list('id', flat=True)
+        )
+        candidates = [
+            (message, reference_id)
+            for message_id, (message, reference_id) in messages.items()
+            if message_id not in existing
+        ]
+
+        # Replies link to parents we already have or are inserting now, the rest wait for their parent
+        reference_ids = {str(ref) for _, ref in candidates if ref}
+        known_references = set(
+            Message.objects.filter(id__in=list(reference_ids)).values_list('id', flat=True)
+        ) | (reference_ids & set(messages))
+        for message, reference_id in candidates:
+            if reference_id and str(reference_id) in known_references:
+                message.reference_message_id = str(reference_id)
+
+        # Another writer may store some of the same messages between the check above and
+        # this insert, only the rows inserted here count towards totals and rollups
+        inserted = _insert_new(Message, [message for message, _ in candidates])
+        new_messages = [(message, reference_id) for message, reference_id in candidates if message.id in inserted]
+
+        pending = [
+            PendingReference(message_id=message.id, reference_id=str(reference_id))
+            for message, reference_id in new_messages
+            if reference_id and message.reference_message_id is None
+        ]
+        PendingReference.objects.bulk_create(pending, ignore_conflicts=True)
+        AverageMessagePending.objects.bulk_create(
+            [AverageMessagePending(message_id=message.id) for message, _ in new_messages], ignore_conflicts=True
+        )
+        resolve_pending_references([message.id for message, _ in new_messages])
+
+        # bulk_create bypasses Message.save(), so apply the counter deltas per batch
+        deltas = {Channel: defaultdict(lambda: [0, 0, 0]), DiscordUser: defaultdict(lambda: [0, 0, 0])}
+        for message, _ in new_messages:
+            for model, pk in ((Channel, message.channel_id), (DiscordUser, message.author_id)):
+                delta = deltas[model][pk]
+                delta[0] += 1
+                delta[1] += message.word_count
+                delta[2] += message.char_count
+        for model, by_pk in deltas.items():
+            _adjust_totals(model, by_pk)
+
+        rollups = RollupDeltas()
+        for message, _ in new_messages:
+            rollups.add(message.aggregate_snapshot(), message.author_id in bots)
+        rollups.apply()
+
+        # Cached stats are stale once anything they show has changed
+        if new_messages or entities_written or (update_existing and roles):
+            bump_generation()
+
+    return {'inserted': len(new_messages), 'skipped': len(messages) - len(new_messages)}
+
+
+def store_backfill_page(checkpoint_id, records, cache=None):
+    """Store one page of backfilled history and advance its checkpoint in the same transaction"""
+    with transaction.atomic():
+        result = store_batch(records, cache=cache)
+        BackfillCheckpoint.objects.filter(pk=checkpoint_id).update(
+            last_message_id=str(records[-1]['message']['id']),
+            messages_stored=models.F('messages_stored') + result['inserted']
+        )
+    return result
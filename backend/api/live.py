@@ -0,0 +1,152 @@
+import asyncio
+from collections import deque
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from .deltas import between, latest_position
+from .models import Message, Channel, DailyRollup, MinuteRollup
+from .view.MessageViews import recent_message_data
+
+# Most messages read from the database per poll, the rest follow on the next one
+POLL_BATCH = 500
+
+
+class Subscriber:
+    """
+    Pending events for one connection.
+
+    Messages queue up to LIVE_MAX_PENDING_MESSAGES; past that the oldest are dropped
+    and the client gets a ``resync`` event telling it to refetch. Every other event
+    is a dict of current values, so a burst merges into one pending copy per event
+    and a slow client only ever receives the latest state.
+    """
+
+    def __init__(self, max_messages=None):
+        self.messages = deque(maxlen=max_messages or settings.LIVE_MAX_PENDING_MESSAGES)
+        self.dropped = 0
+        self.state = {}
+        self.ready = asyncio.Event()
+
+    def offer(self, event, data):
+        if event == 'message':
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped += 1
+            self.messages.append(data)
+        else:
+            self.state.setdefault(event, {}).update(data)
+        self.ready.set()
+
+    async def next_events(self, timeout):
+        """Everything pending as (event, data) pairs, or [] if nothing arrives in ``timeout`` seconds"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.ready.clear()
+
+        events = []
+        if self.dropped:
+            events.append(('resync', {'dropped': self.dropped}))
+            self.dropped = 0
+        events.extend(('message', message) for message in self.messages)
+        events.extend(self.state.items())
+        self.messages.clear()
+        self.state = {}
+        return events
+
+
+class Broker:
+    """
+    In-process fan-out of new messages and stat deltas to live feed connections.
+
+    The bot writes from another process, so a single pump task per web process
+    tails the messages table while anyone is subscribed and publishes what it finds.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self._pump = None
+
+    def subscribe(self):
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._run_pump())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        for subscriber in list(self.subscribers):
+            subscriber.offer(event, data)
+
+    async def _run_pump(self):
+        position = await sync_to_async(latest_position)()
+        while self.subscribers:
+            try:
+                position, events = await sync_to_async(poll)(position)
+            except Exception as e:
+                print(f"Live feed poll failed: {e}")
+                events = []
+            for event, data in events:
+                self.publish(event, data)
+            # A full batch means there is more waiting
+            if sum(1 for event, _ in events if event == 'message') < POLL_BATCH:
+                await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+
+
+def poll(position):
+    """
+    Events for messages stored after ``position`` (timestamp, id), and the position
+    to continue from. Besides the messages this sends the totals, the touched minute
+    buckets of the timeline and the touched channels' counters.
+    """
+    latest = latest_position()
+    if latest is None:
+        return position, []
+    if position is None:
+        return latest, []
+    messages = list(
+        between(Message.objects.select_related('author', 'channel'), position, latest)
+        .order_by('timestamp', 'id')[:POLL_BATCH]
+    )
+    if not messages:
+        return position, []
+
+    events = [('message', recent_message_data(message)) for message in messages]
+
+    now = timezone.now()
+    totals = Channel.objects.aggregate(
+        total_messages=Sum('total_messages'),
+        total_words=Sum('total_words'),
+        total_characters=Sum('total_characters')
+    )
+    today = DailyRollup.objects.filter(date=now.date()).aggregate(count=Sum('message_count'))['count']
+    events.append(('stats', {
+        'total_messages': totals['total_messages'] or 0,
+        'total_words': totals['total_words'] or 0,
+        'total_characters': totals['total_characters'] or 0,
+        'messages_last_24_hours': Message.objects.filter(timestamp__gte=now - timezone.timedelta(hours=24)).count(),
+        'today': {'date': now.date().isoformat(), 'count': today or 0},
+    }))
+
+    minutes = {message.timestamp.replace(second=0, microsecond=0) for message in messages}
+    buckets = (
+        MinuteRollup.objects.filter(start__in=minutes)
+        .values('start').annotate(count=Sum('message_count')).values_list('start', 'count')
+    )
+    events.append(('timeline', {start.isoformat(): count for start, count in buckets}))
+
+    channels = Channel.objects.filter(id__in={message.channel_id for message in messages})
+    events.append(('channels', {
+        channel_id: {'name': name, 'total_messages': total}
+        for channel_id, name, total in channels.values_list('id', 'name', 'total_messages')
+    }))
+
+    last = messages[-1]
+    return (last.timestamp, last.id), events
+
+
+broker = Broker()
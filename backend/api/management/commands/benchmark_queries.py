@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from datetime import timedelta
+from django.utils import timezone
+from api.models import Message, Channel, DiscordUser, Guild
+from api.resolvers import resolvers
+from api.search import search_messages
+import statistics
+import time
+
+
+# Indexes the PostgreSQL plan of a query must use, checked after its EXPLAIN output
+EXPECTED_INDEXES = {
+    'substring search (DatabaseView)': 'api_message_content_trgm_idx',
+    'channel, newest first (DatabaseView)': 'message_channel_ts_idx',
+    'user, newest first (DatabaseView)': 'message_author_ts_idx',
+    'guild, newest first (DatabaseView)': 'message_guild_ts_idx',
+}
+
+
+def hot_queries():
+    """
+    Representative queries issued by the API, keyed by a short description. Names are
+    resolved to IDs first, the way the views do, so the plans show the ID filters.
+    """
+    resolve = resolvers()
+    channel = Channel.objects.order_by('-total_messages').first()
+    user = DiscordUser.objects.order_by('-total_messages').first()
+    guild = Guild.objects.first()
+    now = timezone.now()
+    queries = {
+        'recent messages (RecentMessagesView)': Message.objects.order_by('-timestamp')[:75],
+        'last 24 hours (MessageTimelineView)': Message.objects.filter(timestamp__gte=now - timedelta(hours=24)).values('id'),
+        'attachments, newest first (DatabaseView)': Message.objects.filter(has_attachment=True).order_by('-timestamp')[:50],
+        'substring search (DatabaseView)':
+            search_messages(Message.objects.order_by('-timestamp'), 'http', 'substring').values('id')[:50],
+    }
+    if channel:
+        queries.update({
+            'channel, newest first (DatabaseView)':
+                Message.objects.filter(
+                    channel_id__in=resolve['channel'].resolve([channel.name])
+                ).order_by('-timestamp')[:50],
+            'channel, last 30 days (ChannelProfileView)':
+                Message.objects.filter(channel_id=channel.id, timestamp__gte=now - timedelta(days=30)).values('id'),
+            'per channel flag counts (rebuild_rollups)':
+                Message.objects.filter(channel_id=channel.id).values('channel_id').annotate(
+                    messages=Count('id'), attachments=Sum('attachment_count')
+                ),
+        })
+    if user:
+        queries.update({
+            'user, newest first (DatabaseView)':
+                Message.objects.filter(
+                    author_id__in=resolve['user'].resolve([user.name])
+                ).order_by('-timestamp')[:50],
+            'user, last 30 days (DiscordUserDetailView)':
+                Message.objects.filter(author_id=user.id, timestamp__gte=now - timedelta(days=30)).values('id'),
+        })
+    if guild:
+        queries['guild, newest first (DatabaseView)'] = (
+            Message.objects.filter(guild_id__in=resolve['guild'].resolve([guild.name])).order_by('-timestamp')[:50]
+        )
+    return queries
+
+
+class Command(BaseCommand):
+    help = 'Prints the query plan and timings of the hot API queries, run before and after index changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Number of timed executions per query'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Use EXPLAIN ANALYZE on PostgreSQL to show actual row counts and timings'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor}, {Message.objects.count()} messages\n")
+
+        for name, query in hot_queries().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+
+            explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+            plan = query.explain(**explain_options)
+            for line in plan.splitlines():
+                self.stdout.write(f"  {line}")
+            index = EXPECTED_INDEXES.get(name)
+            if index and connection.vendor == 'postgresql':
+                if index in plan:
+                    self.stdout.write(self.style.SUCCESS(f"  uses {index}"))
+                else:
+                    self.stdout.write(self.style.WARNING(f"  does not use {index}"))
+
+            timings = []
+            for _ in range(max(options['runs'], 1)):
+                started = time.perf_counter()
+                list(query.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"  median {statistics.median(timings):.2f} ms, "
+                f"min {min(timings):.2f} ms, max {max(timings):.2f} ms over {len(timings)} runs\n"
+            )
@@ -1,83 +1,200 @@
-from django.core.management.base import BaseCommand
-from api.models import Message
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from api.exporter import FORMATS, COMPRESSIONS, ExportError, build_queryset, export, output_path
+from api.models import Channel, DiscordUser
+from api.resolvers import Resolver
 import os
+import re
+import time
+
+
+def init_worker():
+    # Forked workers must not share the parent's database connection
+    connections.close_all()
+
+
+def export_worker(filters, path, fmt, compression, batch_size):
+    """Export one channel in a worker process"""
+    return path, export(build_queryset(**filters), path, fmt, compression, batch_size)
+
 
 class Command(BaseCommand):
-    help = 'Exports all messages to a plain text file'
+    help = 'Exports messages as text, JSONL, CSV or Parquet, optionally compressed and split per channel'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--output',
-            default='messages_export.txt',  # Changed default extension to .txt
-            help='Output file path'
+            default='messages_export.txt',
+            help='Output file path, or directory with --per-channel'
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default=None,
+            help='Output format (defaults to the output file extension, else txt)'
+        )
+        parser.add_argument(
+            '--compression',
+            choices=COMPRESSIONS,
+            default=None,
+            help='Compress the output (defaults to the .gz/.zst output extension, else none)'
         )
         parser.add_argument(
             '--batch-size',
             type=int,
             default=10000,
-            help='Number of messages to process in each batch'
+            help='Number of messages fetched per keyset page'
+        )
+        parser.add_argument(
+            '--channel',
+            action='append',
+            default=[],
+            help='Only export this channel (ID or name, repeatable)'
+        )
+        parser.add_argument(
+            '--exclude-channel',
+            action='append',
+            default=[],
+            help='Skip this channel (ID or name, repeatable)'
+        )
+        parser.add_argument(
+            '--user',
+            action='append',
+            default=[],
+            help='Only export messages by this user (ID or name, repeatable)'
+        )
+        parser.add_argument(
+            '--exclude-user',
+            action='append',
+            default=[],
+            help='Skip messages by this user (ID or name, repeatable)'
+        )
+        parser.add_argument(
+            '--exclude-prefix',
+            action='append',
+            default=[],
+            help='Skip messages starting with this text, case insensitive (repeatable, e.g. bot commands)'
+        )
+        parser.add_argument(
+            '--include-bots',
+            action='store_true',
+            help='Include messages sent by bots'
+        )
+        parser.add_argument(
+            '--include-empty',
+            action='store_true',
+            help='Include messages without text content'
+        )
+        parser.add_argument(
+            '--since',
+            default=None,
+            help='Only export messages from this date on (YYYY-MM-DD, UTC)'
+        )
+        parser.add_argument(
+            '--until',
+            default=None,
+            help='Only export messages before this date (YYYY-MM-DD, UTC)'
+        )
+        parser.add_argument(
+            '--per-channel',
+            action='store_true',
+            help='Write one file per channel into the --output directory'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of channels exported in parallel with --per-channel'
         )
 
     def handle(self, *args, **options):
-        output_file = options['output']
-        batch_size = options['batch_size']
-        
-        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
-
-        messages_queryset = (
-            Message.objects
-            .select_related('author')  # Only select_related author since we need its name
-            .filter(
-                author__is_bot=False,
-                content__isnull=False
-            )
-            .exclude(content__exact='')
-            .exclude(channel__name__in=[
-                'bot-shit', 'copypasta', 'quotes-madness-2021',
-                'quotes-madness-2024', 'test', 'john', 'tall-grass'
-            ])
-            .exclude(content__istartswith='pls')  # Exclude messages starting with 'pls'
-            .order_by('timestamp')
-            .only(
-                'timestamp',
-                'content',
-                'author__name'
-            )
-        )
-        
-        total_messages = messages_queryset.count()
-        self.stdout.write(f"Starting export of {total_messages} messages...")
+        output = options['output']
+        fmt = options['format'] or self.format_from_path(output)
+        compression = options['compression'] or self.compression_from_path(output)
+
+        channels = Resolver(Channel)
+        users = Resolver(DiscordUser)
+        filters = {
+            'channel_ids': channels.resolve(options['channel']) if options['channel'] else None,
+            'exclude_channel_ids': channels.resolve(options['exclude_channel']),
+            'author_ids': users.resolve(options['user']) if options['user'] else None,
+            'exclude_author_ids': users.resolve(options['exclude_user']),
+            'include_bots': options['include_bots'],
+            'include_empty': options['include_empty'],
+            'exclude_prefixes': options['exclude_prefix'],
+            'since': self.parse_date(options['since'], '--since'),
+            'until': self.parse_date(options['until'], '--until'),
+        }
+
+        started = time.monotonic()
+        try:
+            if options['per_channel']:
+                total = self.export_per_channel(filters, output, fmt, compression, options)
+            else:
+                path = output_path(output, fmt, compression)
+                self.stdout.write(f"Exporting messages to {path} as {fmt}...")
+                total = export(build_queryset(**filters), path, fmt, compression, options['batch_size'])
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully exported {total} messages in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} messages/s)'
+        ))
+
+    def export_per_channel(self, filters, directory, fmt, compression, options):
+        channels = Channel.objects.order_by('name')
+        if filters['channel_ids'] is not None:
+            channels = channels.filter(pk__in=filters['channel_ids'])
+        if filters['exclude_channel_ids']:
+            channels = channels.exclude(pk__in=filters['exclude_channel_ids'])
+
+        jobs = []
+        for channel_id, name in channels.values_list('pk', 'name'):
+            safe_name = re.sub(r'[^\w.-]+', '_', name)
+            path = output_path(os.path.join(directory, f"{safe_name}-{channel_id}.{fmt}"), fmt, compression)
+            jobs.append(({**filters, 'channel_ids': [channel_id]}, path))
+        self.stdout.write(f"Exporting {len(jobs)} channels to {directory} as {fmt} with {options['workers']} workers...")
+
+        total = 0
+        if options['workers'] <= 1:
+            for channel_filters, path in jobs:
+                _, count = export_worker(channel_filters, path, fmt, compression, options['batch_size'])
+                total += count
+                self.stdout.write(f"{path}: {count} messages")
+            return total
+
+        # Django connections can't cross a fork, so close ours before the pool starts
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            futures = [
+                executor.submit(export_worker, channel_filters, path, fmt, compression, options['batch_size'])
+                for channel_filters, path in jobs
+            ]
+            for future in as_completed(futures):
+                path, count = future.result()
+                total += count
+                self.stdout.write(f"{path}: {count} messages")
+        return total
+
+    def format_from_path(self, path):
+        name = re.sub(r'\.(gz|zst)$', '', path.lower())
+        extension = os.path.splitext(name)[1].lstrip('.')
+        return extension if extension in FORMATS else 'txt'
+
+    def compression_from_path(self, path):
+        if path.lower().endswith('.gz'):
+            return 'gzip'
+        if path.lower().endswith('.zst'):
+            return 'zstd'
+        return 'none'
 
-        processed = 0
+    def parse_date(self, value, option):
+        if not value:
+            return None
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for batch in self.batch_queryset(messages_queryset, batch_size):
-                    for msg in batch:
-                        formatted_line = f"[{msg.author.name}] {msg.content}\n"
-                        f.write(formatted_line)
-                        processed += 1
-                    
-                    # Show progress
-                    progress = (processed / total_messages) * 100
-                    self.stdout.write(f"Processed {processed}/{total_messages} messages ({progress:.1f}%)")
-
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully exported {processed} messages to {output_file}')
-            )
-
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'Error during export: {str(e)}')
-            )
-            raise
-
-    def batch_queryset(self, queryset, batch_size):
-        """Helper method to yield queryset in batches."""
-        start = 0
-        while True:
-            batch = queryset[start:start + batch_size]
-            if not batch:
-                break
-            yield batch
-            start += batch_size
\ No newline at end of file
+            return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        except ValueError:
+            raise CommandError(f'{option} must be in YYYY-MM-DD format')
@@ -0,0 +1,162 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from api.importer import import_file, file_checksum
+from api.models import ImportedFile
+import json
+import os
+import time
+
+
+def init_worker():
+    # Forked workers must not share the parent's database connection
+    connections.close_all()
+
+
+def import_worker(path, chunk_size, force):
+    """Import one export file in a worker process"""
+    file_name = os.path.basename(path)
+    checksum = file_checksum(path)
+    if not force and ImportedFile.objects.filter(checksum=checksum).exists():
+        return {'file': file_name, 'skipped_file': True, 'messages': 0, 'skipped': 0, 'errors': []}
+
+    result = import_file(path, chunk_size=chunk_size)
+    # Files with errors stay unrecorded, so the next run retries them
+    if not result['errors']:
+        ImportedFile.objects.update_or_create(
+            checksum=checksum,
+            defaults={'file_name': file_name, 'messages': result['messages']}
+        )
+    return {'file': file_name, 'skipped_file': False, **result}
+
+
+class Command(BaseCommand):
+    help = 'Imports DiscordChatExporter JSON files from a directory using a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'directory',
+            help='Directory containing the exported .json files'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of messages to store per bulk insert'
+        )
+        parser.add_argument(
+            '--progress-file',
+            default=None,
+            help='JSON progress file (defaults to import_progress.json in the directory)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-import files whose checksum was already imported'
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+
+        self.progress_file = options['progress_file'] or os.path.join(directory, 'import_progress.json')
+        paths = sorted(
+            os.path.abspath(os.path.join(directory, name))
+            for name in os.listdir(directory)
+            if name.endswith('.json')
+        )
+        paths = [path for path in paths if path != os.path.abspath(self.progress_file)]
+        sizes = {path: os.path.getsize(path) for path in paths}
+
+        self.started = time.monotonic()
+        self.progress = {
+            'status': 'running',
+            'pid': os.getpid(),
+            'started_at': timezone.now().isoformat(),
+            'updated_at': None,
+            'files_total': len(paths),
+            'files_done': 0,
+            'files_skipped': 0,
+            'bytes_total': sum(sizes.values()),
+            'bytes_done': 0,
+            'messages': 0,
+            'messages_per_sec': 0.0,
+            'eta_seconds': None,
+            'errors': {},
+        }
+        self.write_progress()
+        self.stdout.write(f"Importing {len(paths)} files with {options['workers']} workers...")
+
+        # Django connections can't cross a fork, so close ours before the pool starts
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=max(options['workers'], 1), initializer=init_worker)
+        try:
+            futures = {
+                executor.submit(import_worker, path, options['chunk_size'], options['force']): path
+                for path in paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        'file': os.path.basename(path),
+                        'skipped_file': False,
+                        'messages': 0,
+                        'skipped': 0,
+                        'errors': [f"Error processing file: {str(e)}"]
+                    }
+                self.record_result(result, sizes[path])
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.progress['status'] = 'stopped'
+            self.write_progress()
+            self.stdout.write(self.style.WARNING('Import stopped'))
+            return
+        executor.shutdown()
+
+        self.progress['status'] = 'completed'
+        self.write_progress()
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {self.progress['files_done']} files ({self.progress['files_skipped']} already imported), "
+            f"imported {self.progress['messages']} messages"
+        ))
+        if self.progress['errors']:
+            self.stdout.write(self.style.WARNING(f"{len(self.progress['errors'])} files had errors, see {self.progress_file}"))
+
+    def record_result(self, result, size):
+        progress = self.progress
+        progress['files_done'] += 1
+        progress['bytes_done'] += size
+        progress['messages'] += result['messages']
+        if result['skipped_file']:
+            progress['files_skipped'] += 1
+        if result['errors']:
+            progress['errors'][result['file']] = result['errors'][:20]
+
+        elapsed = time.monotonic() - self.started
+        progress['messages_per_sec'] = progress['messages'] / elapsed if elapsed else 0.0
+        if progress['bytes_done']:
+            remaining = progress['bytes_total'] - progress['bytes_done']
+            progress['eta_seconds'] = elapsed * remaining / progress['bytes_done']
+        self.write_progress()
+
+        status = 'already imported' if result['skipped_file'] else f"{result['messages']} messages"
+        self.stdout.write(f"[{progress['files_done']}/{progress['files_total']}] {result['file']}: {status}")
+
+    def write_progress(self):
+        self.progress['updated_at'] = timezone.now().isoformat()
+        # Write then rename so readers never see a half written file
+        temp_path = f"{self.progress_file}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.progress, f, indent=2)
+        os.replace(temp_path, self.progress_file)
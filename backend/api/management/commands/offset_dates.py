@@ -1,24 +1,134 @@
-from django.core.management.base import BaseCommand
-from api.models import Message
-from django.utils import timezone
-from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Max, Min
+from datetime import datetime, timedelta, timezone
+from api.models import Message, Guild, Channel
+from api.resolvers import Resolver
+from api.rollups import rebuild
+import time
 
 class Command(BaseCommand):
-    help = 'Offsets all message timestamps by 24 hours backwards'
+    help = 'Shifts message timestamps by a fixed offset (24 hours backwards by default) in chunked bulk UPDATEs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=float,
+            default=None,
+            help='Offset in days, negative moves messages back in time'
+        )
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=None,
+            help='Offset in hours, added to --days'
+        )
+        parser.add_argument(
+            '--minutes',
+            type=float,
+            default=None,
+            help='Offset in minutes, added to --days and --hours'
+        )
+        parser.add_argument(
+            '--guild',
+            action='append',
+            default=[],
+            help='Only shift messages in this guild (ID or name, repeatable)'
+        )
+        parser.add_argument(
+            '--channel',
+            action='append',
+            default=[],
+            help='Only shift messages in this channel (ID or name, repeatable)'
+        )
+        parser.add_argument(
+            '--since',
+            default=None,
+            help='Only shift messages sent from this date on (YYYY-MM-DD, UTC)'
+        )
+        parser.add_argument(
+            '--until',
+            default=None,
+            help='Only shift messages sent before this date (YYYY-MM-DD, UTC)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of messages updated per statement, keeps row locks short'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be shifted'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] is None and options['hours'] is None and options['minutes'] is None:
+            offset = timedelta(days=-1)
+        else:
+            offset = timedelta(
+                days=options['days'] or 0,
+                hours=options['hours'] or 0,
+                minutes=options['minutes'] or 0
+            )
+        if not offset:
+            raise CommandError('The offset must not be zero')
 
-    def handle(self, *args, **kwargs):
-        # Calculate the time offset
-        time_offset = timedelta(days=-1)
-        
-        # Get all messages
         messages = Message.objects.all()
-        
-        # Update each message's timestamp
-        for message in messages:
-            original_timestamp = message.timestamp
-            new_timestamp = original_timestamp + time_offset
-            message.timestamp = new_timestamp
-            message.save()
-            self.stdout.write(self.style.SUCCESS(f'Updated message {message.id} from {original_timestamp} to {new_timestamp}'))
-        
-        self.stdout.write(self.style.SUCCESS('Successfully offset all message timestamps by 24 hours backwards'))
+        if options['guild']:
+            messages = messages.filter(guild_id__in=Resolver(Guild).resolve(options['guild']))
+        if options['channel']:
+            messages = messages.filter(channel_id__in=Resolver(Channel).resolve(options['channel']))
+        if since := self.parse_date(options['since'], '--since'):
+            messages = messages.filter(timestamp__gte=since)
+        if until := self.parse_date(options['until'], '--until'):
+            messages = messages.filter(timestamp__lt=until)
+
+        scope = messages.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        total = messages.count()
+        if not total:
+            self.stdout.write(self.style.WARNING('No messages match the given scope'))
+            return
+
+        self.stdout.write(f"{total} messages from {scope['first']} to {scope['last']}, offset {offset}")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Would move them to {scope['first'] + offset} - {scope['last'] + offset}"
+            ))
+            return
+
+        started = time.monotonic()
+        updated = 0
+        last_id = None
+        while True:
+            # Keyset over the primary key: shifted rows are never selected twice, even when
+            # the new timestamp still falls inside --since/--until
+            chunk = messages.order_by('id')
+            if last_id is not None:
+                chunk = chunk.filter(id__gt=last_id)
+            ids = list(chunk.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            # Each chunk commits on its own, so locks are only held for one batch
+            updated += Message.objects.filter(id__in=ids).update(timestamp=F('timestamp') + offset)
+            self.stdout.write(f"Shifted {updated}/{total} messages")
+
+        # Both the days the messages left and the days they moved to need new rollups
+        rollups_since = min(scope['first'], scope['first'] + offset).date()
+        self.stdout.write(f"Rebuilding rollups since {rollups_since}...")
+        rebuild(since=rollups_since)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully shifted {updated} messages by {offset} in {time.monotonic() - started:.1f}s, "
+            f"now {scope['first'] + offset} - {scope['last'] + offset}"
+        ))
+
+    def parse_date(self, value, option):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        except ValueError:
+            raise CommandError(f'{option} must be in YYYY-MM-DD format')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from datetime import datetime
+from api.rollups import rebuild, prune_minute_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuilds the pre-aggregated daily, hourly and minute rollup tables from the messages table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            default=None,
+            help='Only rebuild days from this date on (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Only delete minute rollups older than MINUTE_ROLLUP_RETENTION_DAYS'
+        )
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            deleted = prune_minute_rollups()
+            self.stdout.write(self.style.SUCCESS(f'Successfully pruned {deleted} minute rollup rows'))
+            return
+
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be in YYYY-MM-DD format')
+
+        self.stdout.write("Rebuilding rollups" + (f" since {since}" if since else "") + "...")
+        created = rebuild(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {created} rollup rows'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.totals import TOTALS_MODELS, find_drift, repair_drift
+
+class Command(BaseCommand):
+    help = 'Verifies incrementally maintained channel/user totals against the messages table and repairs drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Repair drifted totals instead of only reporting them'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=10,
+            help='Number of drifted rows to print per model'
+        )
+
+    def handle(self, *args, **options):
+        total_drift = 0
+
+        for model in TOTALS_MODELS:
+            name = model._meta.verbose_name_plural
+            self.stdout.write(f"Checking {name}...")
+
+            with transaction.atomic():
+                drift = find_drift(model)
+                for obj, stored, actual in drift[:options['show']]:
+                    self.stdout.write(f"  {obj.id}: stored {stored} != actual {actual}")
+                if len(drift) > options['show']:
+                    self.stdout.write(f"  ...and {len(drift) - options['show']} more")
+
+                if drift and options['fix']:
+                    repair_drift(model, drift)
+                    self.stdout.write(f"Repaired {len(drift)} {name}")
+
+            total_drift += len(drift)
+
+        if not total_drift:
+            self.stdout.write(self.style.SUCCESS('All totals are consistent'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {total_drift} drifted totals'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Found {total_drift} drifted totals, run with --fix to repair'))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from itertools import chain
+from api.emojis import extract_emojis
+from api.models import Message
+from api.rollups import rebuild
+import time
+
+class Command(BaseCommand):
+    help = 'Re-extracts inline emojis (unicode sequences and custom emojis) from the content of existing messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of messages read and written per batch'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many messages would change, without writing'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        update_fields = ['inline_emojis', *Message.DERIVED_FIELDS['inline_emojis']]
+        source_fields = list(Message.DERIVED_FIELDS)
+        derived_fields = list(chain.from_iterable(Message.DERIVED_FIELDS.values()))
+
+        total = Message.objects.count()
+        self.stdout.write(f"Checking {total} messages...")
+
+        started = time.monotonic()
+        processed = changed = 0
+        last_id = None
+        while True:
+            # Keyset over the primary key, so every batch is an index range scan
+            batch = Message.objects.order_by('id').only('id', *source_fields, *derived_fields)
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            stale = []
+            for message in batch:
+                inline_emojis = extract_emojis(message.content)
+                if inline_emojis != message.inline_emojis:
+                    message.inline_emojis = inline_emojis
+                    message.set_derived_fields()
+                    stale.append(message)
+
+            # bulk_update skips save(), the rollups are rebuilt once at the end
+            if stale and not dry_run:
+                Message.objects.bulk_update(stale, update_fields)
+
+            processed += len(batch)
+            changed += len(stale)
+            rate = processed / (time.monotonic() - started or 1)
+            self.stdout.write(f"Processed {processed}/{total} messages, {changed} changed ({rate:.0f} messages/s)")
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{changed} messages would change'))
+            return
+
+        if changed:
+            self.stdout.write("Rebuilding rollups...")
+            rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated {changed} messages'))
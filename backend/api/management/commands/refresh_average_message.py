@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from api.average_message import refresh_snapshot
+
+class Command(BaseCommand):
+    help = 'Refreshes the average message snapshot from messages stored since the last refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild the snapshot from every message (picks up edits and deletes)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of messages fetched per round trip'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding average message snapshot..." if options['full'] else "Refreshing average message snapshot...")
+        snapshot, processed = refresh_snapshot(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} messages, snapshot now covers {snapshot.message_count} messages'
+        ))
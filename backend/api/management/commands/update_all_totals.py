@@ -1,22 +1,46 @@
 from django.core.management.base import BaseCommand
-from api.models import Channel, DiscordUser
+from django.db import transaction
+from api.cache import bump_generation
+from api.totals import TOTALS_MODELS, find_drift, rebuild_totals
+import time
 
 class Command(BaseCommand):
-    help = 'Updates total words and characters for all channels and users'
+    help = 'Recomputes total messages, words and characters for all channels and users in one UPDATE each'
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write("Updating channel totals...")
-        channels = Channel.objects.all()
-        for i, channel in enumerate(channels):
-            channel.update_totals()
-            if (i + 1) % 10 == 0:
-                self.stdout.write(f"Processed {i + 1}/{channels.count()} channels")
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows have drifted, without writing'
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Check every row against the messages table after updating'
+        )
 
-        self.stdout.write("Updating user totals...")
-        users = DiscordUser.objects.all()
-        for i, user in enumerate(users):
-            user.update_totals()
-            if (i + 1) % 10 == 0:
-                self.stdout.write(f"Processed {i + 1}/{users.count()} users")
+    def handle(self, *args, **options):
+        for model in TOTALS_MODELS:
+            name = model._meta.verbose_name_plural
+            started = time.monotonic()
 
-        self.stdout.write(self.style.SUCCESS('Successfully updated all totals'))
+            if options['dry_run']:
+                drift = find_drift(model)
+                self.stdout.write(f"{len(drift)} {name} would change")
+                continue
+
+            self.stdout.write(f"Updating {model._meta.verbose_name} totals...")
+            with transaction.atomic():
+                updated = rebuild_totals(model)
+                bump_generation()
+            self.stdout.write(f"Updated {updated} {name} in {time.monotonic() - started:.1f}s")
+
+            if options['verify']:
+                drift = find_drift(model)
+                if drift:
+                    self.stdout.write(self.style.WARNING(f"{len(drift)} {name} still disagree with their messages"))
+                else:
+                    self.stdout.write(f"Verified all {name}")
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Successfully updated all totals'))
@@ -1,21 +1,76 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from itertools import chain
+from api.cache import bump_generation
 from api.models import Message
+from api.rollups import rebuild
+from api.totals import TOTALS_MODELS, rebuild_totals
+import time
 
 class Command(BaseCommand):
-    help = 'Updates word_count and char_count for all existing messages'
-
-    def handle(self, *args, **kwargs):
-        messages = Message.objects.all()
-        total = messages.count()
-        self.stdout.write(f"Updating {total} messages...")
-
-        for i, message in enumerate(messages):
-            if message.content:
-                message.word_count = len(message.content.split())
-                message.char_count = len(message.content)
-                message.save(update_fields=['word_count', 'char_count'])
-            
-            if (i + 1) % 1000 == 0:
-                self.stdout.write(f"Processed {i + 1}/{total} messages...")
-
-        self.stdout.write(self.style.SUCCESS('Successfully updated all messages'))
+    help = 'Recomputes the content features (api.features) and attachment/mention/emoji flags for all existing messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of messages read and written per batch'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many messages would change, without writing'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        source_fields = list(Message.DERIVED_FIELDS)
+        derived_fields = list(chain.from_iterable(Message.DERIVED_FIELDS.values()))
+
+        total = Message.objects.count()
+        self.stdout.write(f"Checking {total} messages...")
+
+        started = time.monotonic()
+        processed = changed = 0
+        last_id = None
+        while True:
+            # Keyset over the primary key, so every batch is an index range scan
+            batch = Message.objects.order_by('id').only('id', *source_fields, *derived_fields)
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            stale = []
+            for message in batch:
+                stored = [getattr(message, field) for field in derived_fields]
+                message.set_derived_fields()
+                if stored != [getattr(message, field) for field in derived_fields]:
+                    stale.append(message)
+
+            # bulk_update skips save(), totals and rollups are rebuilt once at the end
+            if stale and not dry_run:
+                Message.objects.bulk_update(stale, derived_fields)
+
+            processed += len(batch)
+            changed += len(stale)
+            rate = processed / (time.monotonic() - started or 1)
+            self.stdout.write(f"Processed {processed}/{total} messages, {changed} changed ({rate:.0f} messages/s)")
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{changed} messages would change'))
+            return
+
+        if changed:
+            self.stdout.write("Rebuilding channel/user totals and daily rollups...")
+            with transaction.atomic():
+                for model in TOTALS_MODELS:
+                    rebuild_totals(model)
+                rebuild()
+                bump_generation()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated {changed} messages'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_alter_role_color'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference_id', models.CharField(db_index=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_reference', to='api.message')),
+            ],
+        ),
+    ]
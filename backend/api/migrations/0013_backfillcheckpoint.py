@@ -0,0 +1,30 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_pendingreference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel_id', models.CharField(max_length=255)),
+                ('range_start', models.DateTimeField()),
+                ('range_end', models.DateTimeField()),
+                ('last_message_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('messages_stored', models.IntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='backfillcheckpoint',
+            constraint=models.UniqueConstraint(fields=('channel_id', 'range_start', 'range_end'), name='unique_backfill_checkpoint'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    Message = apps.get_model('api', 'Message')
+    DailyRollup = apps.get_model('api', 'DailyRollup')
+    aggregates = (
+        Message.objects
+        .order_by()
+        .values(
+            'channel_id',
+            'author_id',
+            'author__is_bot',
+            day=TruncDate('timestamp'),
+            message_guild=Coalesce('guild_id', 'channel__guild_id'),
+        )
+        .annotate(
+            messages=Count('id'),
+            words=Sum('word_count'),
+            chars=Sum('char_count'),
+            attachment_messages=Count('id', filter=~Q(attachments=[])),
+            mention_messages=Count('id', filter=~Q(mentions=[])),
+            emoji_messages=Count('id', filter=~Q(inline_emojis=[])),
+        )
+    )
+    batch = []
+    for row in aggregates.iterator(chunk_size=5000):
+        batch.append(DailyRollup(
+            date=row['day'],
+            guild_id=row['message_guild'],
+            channel_id=row['channel_id'],
+            author_id=row['author_id'],
+            is_bot=row['author__is_bot'],
+            message_count=row['messages'],
+            word_count=row['words'] or 0,
+            char_count=row['chars'] or 0,
+            attachment_count=row['attachment_messages'],
+            mention_count=row['mention_messages'],
+            emoji_count=row['emoji_messages'],
+        ))
+        if len(batch) >= 5000:
+            DailyRollup.objects.bulk_create(batch)
+            batch = []
+    DailyRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_importedfile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('is_bot', models.BooleanField(default=False)),
+                ('message_count', models.IntegerField(default=0)),
+                ('word_count', models.IntegerField(default=0)),
+                ('char_count', models.IntegerField(default=0)),
+                ('attachment_count', models.IntegerField(default=0)),
+                ('mention_count', models.IntegerField(default=0)),
+                ('emoji_count', models.IntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.discorduser')),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.channel')),
+                ('guild', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.guild')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='api_dailyro_date_c174f6_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'channel', 'author'), name='unique_daily_rollup'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AverageMessageSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_count', models.IntegerField(default=0)),
+                ('total_chars', models.BigIntegerField(default=0)),
+                ('position_totals', models.JSONField(default=list)),
+                ('char_counts', models.JSONField(default=list)),
+                ('word_counts', models.JSONField(default=list)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('last_message_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.17 on 2026-10-18 20:05
+
+from django.db import migrations
+from ._search_index import restore_sqlite_search_index
+
+# The search index lives outside the model: a generated tsvector column plus a trigram
+# index on PostgreSQL, an external content FTS5 table kept in sync by triggers on SQLite.
+# Both are maintained by the database itself, so bulk_create and raw updates stay indexed.
+# The SQLite side lives in _search_index; api.search.ensure_sqlite_fts() repeats it after
+# every migrate because SQLite table rebuilds drop the triggers.
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE api_message ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+    "CREATE INDEX api_message_search_vector_idx ON api_message USING gin (search_vector)",
+    # Serves the ILIKE substring search in api.search; Django's icontains wraps the column
+    # in UPPER() and would not use it
+    "CREATE INDEX api_message_content_trgm_idx ON api_message USING gin (content gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS api_message_content_trgm_idx",
+    "DROP INDEX IF EXISTS api_message_search_vector_idx",
+    "ALTER TABLE api_message DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS api_message_fts_update",
+    "DROP TRIGGER IF EXISTS api_message_fts_delete",
+    "DROP TRIGGER IF EXISTS api_message_fts_insert",
+    "DROP TABLE IF EXISTS api_message_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {'postgresql': postgres, 'sqlite': sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+def create_search_index(apps, schema_editor):
+    run_for_vendor(POSTGRES_FORWARD, [])(apps, schema_editor)
+    restore_sqlite_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_statsgeneration'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_search_index,
+            run_for_vendor(POSTGRES_REVERSE, SQLITE_REVERSE),
+        ),
+    ]
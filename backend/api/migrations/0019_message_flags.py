@@ -0,0 +1,102 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:39
+
+from django.db import migrations, models
+from ._search_index import restore_sqlite_search_index
+
+# (JSON list column, flag column, count column)
+FLAG_COLUMNS = (
+    ('attachments', 'has_attachment', 'attachment_count'),
+    ('mentions', 'has_mention', 'mention_count'),
+    ('inline_emojis', 'has_emoji', 'emoji_count'),
+)
+
+
+def populate_flags(apps, schema_editor):
+    Message = apps.get_model('api', 'Message')
+    vendor = schema_editor.connection.vendor
+    for source, flag, count in FLAG_COLUMNS:
+        if vendor == 'postgresql':
+            schema_editor.execute(
+                f"UPDATE api_message SET {count} = jsonb_array_length({source}), "
+                f"{flag} = jsonb_array_length({source}) > 0 "
+                f"WHERE jsonb_typeof({source}) = 'array' AND {source} <> '[]'::jsonb"
+            )
+        elif vendor == 'sqlite':
+            schema_editor.execute(
+                f"UPDATE api_message SET {count} = json_array_length({source}), "
+                f"{flag} = json_array_length({source}) > 0 "
+                f"WHERE json_type({source}) = 'array' AND json_array_length({source}) > 0"
+            )
+        else:
+            batch = []
+            for message in Message.objects.exclude(**{source: []}).only('id', source).iterator(chunk_size=5000):
+                setattr(message, count, len(getattr(message, source) or []))
+                setattr(message, flag, getattr(message, count) > 0)
+                batch.append(message)
+                if len(batch) >= 5000:
+                    Message.objects.bulk_update(batch, [flag, count])
+                    batch = []
+            Message.objects.bulk_update(batch, [flag, count])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_message_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='attachment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='emoji_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='has_attachment',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='has_emoji',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='has_mention',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='mention_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_flags, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('has_attachment', True)), fields=['-timestamp'], name='message_attachment_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('has_mention', True)), fields=['-timestamp'], name='message_mention_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('has_emoji', True)), fields=['-timestamp'], name='message_emoji_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['author', 'has_attachment', 'has_mention', 'has_emoji'], name='message_author_flags_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['channel', 'has_attachment', 'has_mention', 'has_emoji'], name='message_channel_flags_idx'),
+        ),
+        # SQLite applies these changes by copying api_message, which drops the search triggers
+        migrations.RunPython(restore_sqlite_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from ._search_index import restore_sqlite_search_index
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_message_flags'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='api_message_channel_1c21a7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='api_message_author__b0e470_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='api_message_timesta_97ab18_idx',
+        ),
+        migrations.AlterField(
+            model_name='channel',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='discorduser',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='guild',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='api.discorduser'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='channel',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='api.channel'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='guild',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='api.guild'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['channel', 'timestamp'], name='message_channel_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['author', 'timestamp'], name='message_author_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['guild', 'timestamp'], name='message_guild_ts_idx'),
+        ),
+        # SQLite applies these changes by copying api_message, which drops the search triggers
+        migrations.RunPython(restore_sqlite_search_index, migrations.RunPython.noop),
+    ]
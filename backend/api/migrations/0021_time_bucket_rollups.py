@@ -0,0 +1,95 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import Coalesce, TruncHour, TruncMinute
+from django.utils import timezone
+
+
+def populate_buckets(apps, schema_editor):
+    Message = apps.get_model('api', 'Message')
+    cutoff = timezone.now().replace(second=0, microsecond=0) - timedelta(days=settings.MINUTE_ROLLUP_RETENTION_DAYS)
+    for model_name, trunc, messages in (
+        ('HourlyRollup', TruncHour, Message.objects.all()),
+        ('MinuteRollup', TruncMinute, Message.objects.filter(timestamp__gte=cutoff)),
+    ):
+        model = apps.get_model('api', model_name)
+        aggregates = (
+            messages
+            .order_by()
+            .values(
+                'channel_id',
+                'author_id',
+                'author__is_bot',
+                bucket=trunc('timestamp'),
+                message_guild=Coalesce('guild_id', 'channel__guild_id'),
+            )
+            .annotate(messages=Count('id'))
+        )
+        batch = []
+        for row in aggregates.iterator(chunk_size=5000):
+            batch.append(model(
+                start=row['bucket'],
+                guild_id=row['message_guild'],
+                channel_id=row['channel_id'],
+                author_id=row['author_id'],
+                is_bot=row['author__is_bot'],
+                message_count=row['messages'],
+            ))
+            if len(batch) >= 5000:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('is_bot', models.BooleanField(default=False)),
+                ('message_count', models.IntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='api.discorduser')),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='api.channel')),
+                ('guild', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='api.guild')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MinuteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('is_bot', models.BooleanField(default=False)),
+                ('message_count', models.IntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='minute_rollups', to='api.discorduser')),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='minute_rollups', to='api.channel')),
+                ('guild', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='minute_rollups', to='api.guild')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start'], name='api_minuter_start_02422f_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='minuterollup',
+            constraint=models.UniqueConstraint(fields=('start', 'channel', 'author'), name='unique_minute_rollup'),
+        ),
+        migrations.AddIndex(
+            model_name='hourlyrollup',
+            index=models.Index(fields=['start'], name='api_hourlyr_start_8da454_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyrollup',
+            constraint=models.UniqueConstraint(fields=('start', 'channel', 'author'), name='unique_hourly_rollup'),
+        ),
+        migrations.RunPython(populate_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:53
+
+from django.db import migrations, models
+from ._search_index import restore_sqlite_search_index
+
+# Content features are computed in Python (api.features), existing rows are filled
+# in batches by `manage.py update_message_counts` rather than inside this migration.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_time_bucket_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='code_block_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='is_command',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='token_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='unique_token_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='url_count',
+            field=models.IntegerField(default=0),
+        ),
+        # SQLite applies these changes by copying api_message, which drops the search triggers
+        migrations.RunPython(restore_sqlite_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_message_features'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statsgeneration',
+            name='entity_generation',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
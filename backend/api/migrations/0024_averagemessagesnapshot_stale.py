@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_statsgeneration_entity_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='averagemessagesnapshot',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The old snapshot followed a timestamp watermark and may have missed backfilled history,
+# dropping it makes the first refresh start over; new messages are queued from then on.
+
+
+def drop_snapshot(apps, schema_editor):
+    apps.get_model('api', 'AverageMessageSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_averagemessagesnapshot_stale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AverageMessagePending',
+            fields=[
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='average_pending', serialize=False, to='api.message')),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='averagemessagesnapshot',
+            name='last_message_id',
+        ),
+        migrations.RemoveField(
+            model_name='averagemessagesnapshot',
+            name='last_timestamp',
+        ),
+        migrations.RemoveField(
+            model_name='averagemessagesnapshot',
+            name='stale',
+        ),
+        migrations.RunPython(drop_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_average_message_pending'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='statsgeneration',
+            name='entity_generation',
+        ),
+    ]
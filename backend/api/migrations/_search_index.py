@@ -0,0 +1,35 @@
+"""
+Frozen copy of the SQLite search index SQL for migrations, which must keep working
+however api.search and the Message model change later. The loader skips modules
+starting with an underscore, so this is not a migration itself.
+"""
+
+SQLITE_TRIGGERS = {
+    'api_message_fts_insert':
+        "CREATE TRIGGER IF NOT EXISTS api_message_fts_insert AFTER INSERT ON api_message BEGIN "
+        "INSERT INTO api_message_fts(rowid, content) VALUES (new.rowid, new.content); END",
+    'api_message_fts_delete':
+        "CREATE TRIGGER IF NOT EXISTS api_message_fts_delete AFTER DELETE ON api_message BEGIN "
+        "INSERT INTO api_message_fts(api_message_fts, rowid, content) VALUES ('delete', old.rowid, old.content); END",
+    'api_message_fts_update':
+        "CREATE TRIGGER IF NOT EXISTS api_message_fts_update AFTER UPDATE OF content ON api_message BEGIN "
+        "INSERT INTO api_message_fts(api_message_fts, rowid, content) VALUES ('delete', old.rowid, old.content); "
+        "INSERT INTO api_message_fts(rowid, content) VALUES (new.rowid, new.content); END",
+}
+
+
+def restore_sqlite_search_index(apps, schema_editor):
+    """
+    RunPython operation recreating the FTS5 table and triggers and reindexing every
+    message. SQLite applies most schema changes by copying api_message, which drops
+    its triggers and can renumber its rowids.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS api_message_fts "
+        "USING fts5(content, content='api_message', content_rowid='rowid')"
+    )
+    for statement in SQLITE_TRIGGERS.values():
+        schema_editor.execute(statement)
+    schema_editor.execute("INSERT INTO api_message_fts(api_message_fts) VALUES ('rebuild')")
@@ -1,9 +1,11 @@
-from django.db import models
+from functools import partial
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from .features import FEATURE_FIELDS, extract_features
 
 class Guild(models.Model):
     id = models.CharField(max_length=255, primary_key=True)
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     icon_url = models.URLField(blank=True, null=True)
 
     def __str__(self):
@@ -13,7 +15,7 @@ class Guild(models.Model):
 class Channel(models.Model):
     id = models.CharField(max_length=255, primary_key=True)
     guild = models.ForeignKey(Guild, related_name='channels', on_delete=models.CASCADE)
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     type = models.CharField(max_length=50)  # e.g., 'text', 'voice'
     category_id = models.CharField(max_length=255, blank=True, null=True)
     category_name = models.CharField(max_length=255, blank=True, null=True)
@@ -33,6 +35,17 @@ class Channel(models.Model):
         self.total_characters = stats['total_characters'] or 0
         self.save(update_fields=['total_messages', 'total_words', 'total_characters'])
 
+    @classmethod
+    def adjust_totals(cls, pk, messages=0, words=0, characters=0):
+        """Apply a delta to the stored totals without re-aggregating messages"""
+        if not (messages or words or characters):
+            return
+        cls.objects.filter(pk=pk).update(
+            total_messages=models.F('total_messages') + messages,
+            total_words=models.F('total_words') + words,
+            total_characters=models.F('total_characters') + characters
+        )
+
     def __str__(self):
         return self.name
 
@@ -50,7 +63,7 @@ class Role(models.Model):
 
 class DiscordUser(models.Model):
     id = models.CharField(max_length=255, primary_key=True)
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     discriminator = models.CharField(max_length=4)
     nickname = models.CharField(max_length=255, blank=True, null=True)
     avatar_url = models.URLField(blank=True, null=True)
@@ -72,6 +85,17 @@ class DiscordUser(models.Model):
         self.total_characters = stats['total_characters'] or 0
         self.save(update_fields=['total_messages', 'total_words', 'total_characters'])
 
+    @classmethod
+    def adjust_totals(cls, pk, messages=0, words=0, characters=0):
+        """Apply a delta to the stored totals without re-aggregating messages"""
+        if not (messages or words or characters):
+            return
+        cls.objects.filter(pk=pk).update(
+            total_messages=models.F('total_messages') + messages,
+            total_words=models.F('total_words') + words,
+            total_characters=models.F('total_characters') + characters
+        )
+
     def __str__(self):
         return f"[{self.id}][{self.name}]({self.nickname})"
 
@@ -83,10 +107,11 @@ class Message(models.Model):
         related_name='messages', 
         on_delete=models.CASCADE,
         null=True,  # Allow null temporarily for migration
-        blank=True
+        blank=True,
+        db_index=False  # Covered by the (guild, timestamp) index
     )
-    channel = models.ForeignKey(Channel, related_name='messages', on_delete=models.CASCADE)
-    author = models.ForeignKey(DiscordUser, related_name='messages', on_delete=models.CASCADE)
+    channel = models.ForeignKey(Channel, related_name='messages', on_delete=models.CASCADE, db_index=False)
+    author = models.ForeignKey(DiscordUser, related_name='messages', on_delete=models.CASCADE, db_index=False)
     type = models.CharField(max_length=50)  # e.g., 'Default', 'Reply'
     content = models.TextField()
     timestamp = models.DateTimeField()
@@ -104,44 +129,306 @@ class Message(models.Model):
     inline_emojis = models.JSONField(default=list, blank=True)
     word_count = models.IntegerField(default=0)
     char_count = models.IntegerField(default=0)
+    # Content features from api.features, see FEATURE_FIELDS
+    token_count = models.IntegerField(default=0)
+    unique_token_count = models.IntegerField(default=0)
+    url_count = models.IntegerField(default=0)
+    code_block_count = models.IntegerField(default=0)
+    is_command = models.BooleanField(default=False)
+    # Denormalized from the JSON lists so filters and counts can use indexes
+    has_attachment = models.BooleanField(default=False)
+    has_mention = models.BooleanField(default=False)
+    has_emoji = models.BooleanField(default=False)
+    attachment_count = models.IntegerField(default=0)
+    mention_count = models.IntegerField(default=0)
+    emoji_count = models.IntegerField(default=0)
+
+    # Columns that feed the channel/user totals and the daily rollups
+    AGGREGATE_FIELDS = (
+        'guild_id', 'channel_id', 'author_id', 'timestamp', 'word_count', 'char_count',
+        'has_attachment', 'has_mention', 'has_emoji'
+    )
+
+    # Columns computed from other columns by set_derived_fields()
+    DERIVED_FIELDS = {
+        'content': FEATURE_FIELDS,
+        'attachments': ('has_attachment', 'attachment_count'),
+        'mentions': ('has_mention', 'mention_count'),
+        'inline_emojis': ('has_emoji', 'emoji_count'),
+    }
+
+    def aggregate_snapshot(self):
+        return {field: getattr(self, field) for field in self.AGGREGATE_FIELDS}
+
+    def set_derived_fields(self):
+        for field, value in extract_features(self.content).items():
+            setattr(self, field, value)
+
+        self.attachment_count = len(self.attachments or [])
+        self.mention_count = len(self.mentions or [])
+        self.emoji_count = len(self.inline_emojis or [])
+        self.has_attachment = self.attachment_count > 0
+        self.has_mention = self.mention_count > 0
+        self.has_emoji = self.emoji_count > 0
 
     def save(self, *args, **kwargs):
-        # Calculate word and character counts
-        if self.content:
-            self.word_count = len(self.content.split())
-            self.char_count = len(self.content)
-            #print(f"Saving message with word_count: {self.word_count}, char_count: {self.char_count}")
-        
+        self.set_derived_fields()
+
+        # Derived columns have to be written along with the columns they come from
+        if kwargs.get('update_fields') is not None:
+            update_fields = set(kwargs['update_fields'])
+            for source, derived in self.DERIVED_FIELDS.items():
+                if source in update_fields:
+                    update_fields.update(derived)
+            kwargs['update_fields'] = update_fields
+
         # Set guild from channel if not explicitly set
         if not self.guild_id and self.channel:
             self.guild = self.channel.guild
-            
-        super().save(*args, **kwargs)
-        
-        # Update totals for related models
-        if self.channel:
-            self.channel.update_totals()
-        if self.author:
-            self.author.update_totals()
+
+        written = None
+        if kwargs.get('update_fields') is not None:
+            written = {self._meta.get_field(name).attname for name in kwargs['update_fields']}
+        # Saves that leave every aggregate column alone have no delta to apply
+        tracked = written is None or not written.isdisjoint(self.AGGREGATE_FIELDS)
+
+        with transaction.atomic():
+            # Only the previous aggregate columns are needed to work out the delta
+            previous = None
+            if tracked and not kwargs.get('force_insert'):
+                previous = Message.objects.filter(pk=self.pk).values(*self.AGGREGATE_FIELDS).first()
+
+            super().save(*args, **kwargs)
+            if previous is None and tracked:
+                AverageMessagePending.objects.get_or_create(message_id=self.pk)
+            if not tracked:
+                return
+
+            # Columns skipped by update_fields keep their stored value
+            current = self.aggregate_snapshot()
+            if previous and written is not None:
+                current = {key: (value if key in written else previous[key]) for key, value in current.items()}
+
+            if current != previous:
+                self._defer_aggregate_deltas((previous, -1), (current, 1))
 
     def delete(self, *args, **kwargs):
-        channel = self.channel
-        author = self.author
-        super().delete(*args, **kwargs)
-        
-        # Update totals after deletion
-        if channel:
-            channel.update_totals()
-        if author:
-            author.update_totals()
+        result = super().delete(*args, **kwargs)
+        self._defer_aggregate_deltas((self.aggregate_snapshot(), -1))
+        return result
+
+    @classmethod
+    def _defer_aggregate_deltas(cls, *changes):
+        """
+        Apply the totals and rollup deltas of a single save or delete once it has
+        committed, in a short transaction of their own, so writers don't hold the
+        counter and rollup rows for the length of theirs. Bulk writes go through
+        api.ingest instead. Should the process die in between, reconcile_totals and
+        rebuild_rollups repair the drift.
+        """
+        transaction.on_commit(partial(cls._apply_aggregate_deltas, *changes))
+
+    @staticmethod
+    @transaction.atomic
+    def _apply_aggregate_deltas(*changes):
+        """Apply (snapshot, sign) pairs to totals and rollups, netting out edits in place"""
+        from .cache import bump_generation
+        from .rollups import RollupDeltas
+
+        changes = [(snapshot, sign) for snapshot, sign in changes if snapshot]
+        deltas = {}
+        for snapshot, sign in changes:
+            for model, pk in ((Channel, snapshot['channel_id']), (DiscordUser, snapshot['author_id'])):
+                if not pk:
+                    continue
+                delta = deltas.setdefault((model, pk), [0, 0, 0])
+                delta[0] += sign
+                delta[1] += sign * (snapshot['word_count'] or 0)
+                delta[2] += sign * (snapshot['char_count'] or 0)
+
+        for (model, pk), (messages, words, characters) in deltas.items():
+            model.adjust_totals(pk, messages=messages, words=words, characters=characters)
+
+        rollups = RollupDeltas()
+        bots = set(DiscordUser.objects.filter(
+            pk__in={snapshot['author_id'] for snapshot, _ in changes}, is_bot=True
+        ).values_list('pk', flat=True))
+        for snapshot, sign in changes:
+            rollups.add(snapshot, snapshot['author_id'] in bots, sign)
+        rollups.apply()
+        bump_generation()
 
     def __str__(self):
         return f"[{self.id}][{self.timestamp.strftime('%m-%d-%y')}][{self.timestamp.strftime('%I:%M %p')}][{self.channel.name}][{self.author.name}]"
 
     class Meta:
         indexes = [
+            # A b-tree serves both sort directions, so one timestamp index covers newest first too
             models.Index(fields=['timestamp']),
-            models.Index(fields=['channel']),
-            models.Index(fields=['author']),
-            models.Index(fields=['-timestamp']),
+            # Per channel/author/guild listings and time ranges, these also replace the plain FK indexes
+            models.Index(fields=['channel', 'timestamp'], name='message_channel_ts_idx'),
+            models.Index(fields=['author', 'timestamp'], name='message_author_ts_idx'),
+            models.Index(fields=['guild', 'timestamp'], name='message_guild_ts_idx'),
+            # Newest first listings filtered by a flag only touch flagged rows
+            models.Index(fields=['-timestamp'], condition=models.Q(has_attachment=True), name='message_attachment_ts_idx'),
+            models.Index(fields=['-timestamp'], condition=models.Q(has_mention=True), name='message_mention_ts_idx'),
+            models.Index(fields=['-timestamp'], condition=models.Q(has_emoji=True), name='message_emoji_ts_idx'),
+            # Per user and per channel flag counts can be answered from the index alone
+            models.Index(fields=['author', 'has_attachment', 'has_mention', 'has_emoji'], name='message_author_flags_idx'),
+            models.Index(fields=['channel', 'has_attachment', 'has_mention', 'has_emoji'], name='message_channel_flags_idx'),
+        ]
+
+
+class PendingReference(models.Model):
+    """A reply whose parent message has not been stored yet"""
+    message = models.OneToOneField(Message, related_name='pending_reference', on_delete=models.CASCADE)
+    reference_id = models.CharField(max_length=255, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"[{self.message_id}] -> [{self.reference_id}]"
+
+
+class BackfillCheckpoint(models.Model):
+    """Per-channel progress of a history backfill over [range_start, range_end)"""
+    channel_id = models.CharField(max_length=255)
+    range_start = models.DateTimeField()
+    range_end = models.DateTimeField()
+    last_message_id = models.CharField(max_length=255, blank=True, null=True)
+    messages_stored = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"[{self.channel_id}][{self.range_start:%m-%d-%y} - {self.range_end:%m-%d-%y}]({self.last_message_id})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['channel_id', 'range_start', 'range_end'],
+                name='unique_backfill_checkpoint'
+            ),
+        ]
+
+
+class ImportedFile(models.Model):
+    """A JSON export that has been fully imported, identified by its content checksum"""
+    checksum = models.CharField(max_length=64, unique=True)
+    file_name = models.CharField(max_length=255)
+    messages = models.IntegerField(default=0)
+    imported_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"[{self.file_name}]({self.checksum[:12]})"
+
+
+class DailyRollup(models.Model):
+    """Per day, channel and author message aggregates, maintained on every write"""
+    date = models.DateField()
+    guild = models.ForeignKey(Guild, related_name='daily_rollups', on_delete=models.CASCADE, null=True, blank=True)
+    channel = models.ForeignKey(Channel, related_name='daily_rollups', on_delete=models.CASCADE)
+    author = models.ForeignKey(DiscordUser, related_name='daily_rollups', on_delete=models.CASCADE)
+    is_bot = models.BooleanField(default=False)
+    message_count = models.IntegerField(default=0)
+    word_count = models.IntegerField(default=0)
+    char_count = models.IntegerField(default=0)
+    attachment_count = models.IntegerField(default=0)
+    mention_count = models.IntegerField(default=0)
+    emoji_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"[{self.date}][{self.channel_id}][{self.author_id}]({self.message_count})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'channel', 'author'],
+                name='unique_daily_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+
+class HourlyRollup(models.Model):
+    """Per hour, channel and author message counts, maintained on every write"""
+    start = models.DateTimeField()
+    guild = models.ForeignKey(Guild, related_name='hourly_rollups', on_delete=models.CASCADE, null=True, blank=True)
+    channel = models.ForeignKey(Channel, related_name='hourly_rollups', on_delete=models.CASCADE)
+    author = models.ForeignKey(DiscordUser, related_name='hourly_rollups', on_delete=models.CASCADE)
+    is_bot = models.BooleanField(default=False)
+    message_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"[{self.start}][{self.channel_id}][{self.author_id}]({self.message_count})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['start', 'channel', 'author'],
+                name='unique_hourly_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['start']),
+        ]
+
+
+class MinuteRollup(models.Model):
+    """Per minute, channel and author message counts, only kept for MINUTE_ROLLUP_RETENTION_DAYS"""
+    start = models.DateTimeField()
+    guild = models.ForeignKey(Guild, related_name='minute_rollups', on_delete=models.CASCADE, null=True, blank=True)
+    channel = models.ForeignKey(Channel, related_name='minute_rollups', on_delete=models.CASCADE)
+    author = models.ForeignKey(DiscordUser, related_name='minute_rollups', on_delete=models.CASCADE)
+    is_bot = models.BooleanField(default=False)
+    message_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"[{self.start}][{self.channel_id}][{self.author_id}]({self.message_count})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['start', 'channel', 'author'],
+                name='unique_minute_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['start']),
         ]
+
+class AverageMessageSnapshot(models.Model):
+    """Per position character and word histograms behind the average message, refreshed incrementally"""
+    message_count = models.IntegerField(default=0)
+    total_chars = models.BigIntegerField(default=0)
+    position_totals = models.JSONField(default=list)
+    char_counts = models.JSONField(default=list)
+    word_counts = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"[{self.updated_at}]({self.message_count})"
+
+
+class AverageMessagePending(models.Model):
+    """
+    A stored message not yet folded into the average message snapshot. Queued by
+    whatever inserts the message, so backfilled and imported history is picked up
+    no matter how old its timestamp or in which order the writers commit.
+    """
+    message = models.OneToOneField(
+        Message, related_name='average_pending', on_delete=models.CASCADE, primary_key=True
+    )
+
+    def __str__(self):
+        return f"[{self.message_id}]"
+
+
+class StatsGeneration(models.Model):
+    """Counter bumped on every write that changes stats, part of every cached response key"""
+    generation = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"[{self.updated_at}]({self.generation})"
@@ -0,0 +1,54 @@
+from collections import defaultdict
+from django.db.models import Q
+from .models import Guild, Channel, DiscordUser
+
+
+class Resolver:
+    """
+    Maps user supplied IDs or names to primary keys for one model.
+
+    Each lookup is a single ``pk IN (...) OR name IN (...)`` query on indexed columns
+    covering only the values asked for, so views can filter on indexed foreign keys
+    instead of joining on names. Names shared by several rows resolve to all of them.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def _lookup(self, values):
+        ids, names = set(), defaultdict(list)
+        # Most active first, so it wins when a name is shared
+        ordering = '-total_messages' if hasattr(self.model, 'total_messages') else 'pk'
+        rows = self.model.objects.filter(Q(pk__in=values) | Q(name__in=values)).order_by(ordering)
+        for pk, name in rows.values_list('pk', 'name'):
+            ids.add(pk)
+            names[name].append(pk)
+        return ids, names
+
+    def resolve(self, values):
+        """Primary keys for a list of IDs and/or names, unknown values resolve to nothing"""
+        values = [str(value).strip() for value in values]
+        if not values:
+            return []
+        ids, names = self._lookup(values)
+        resolved = []
+        for value in values:
+            if value in ids:
+                resolved.append(value)
+            else:
+                resolved.extend(names.get(value, []))
+        return resolved
+
+    def resolve_one(self, value):
+        """Primary key for one ID or name; for duplicate names the most active row wins"""
+        resolved = self.resolve([value])
+        return resolved[0] if resolved else None
+
+
+def resolvers():
+    """Guild, channel and user resolvers, keyed like the query parameters that use them"""
+    return {
+        'guild': Resolver(Guild),
+        'channel': Resolver(Channel),
+        'user': Resolver(DiscordUser),
+    }
@@ -0,0 +1,221 @@
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncHour, TruncMinute
+from .models import DailyRollup, HourlyRollup, MinuteRollup, Message
+from .cache import bump_generation
+
+ROLLUP_KEYS = ('date', 'guild_id', 'channel_id', 'author_id', 'is_bot')
+ROLLUP_COUNTS = (
+    'message_count', 'word_count', 'char_count', 'attachment_count', 'mention_count', 'emoji_count'
+)
+BUCKET_KEYS = ('start', 'guild_id', 'channel_id', 'author_id', 'is_bot')
+BUCKET_COUNTS = ('message_count',)
+
+# Bucket table -> function truncating a message timestamp to its bucket start
+BUCKET_MODELS = {
+    HourlyRollup: TruncHour,
+    MinuteRollup: TruncMinute,
+}
+
+
+def minute_rollup_cutoff():
+    """Start of the oldest minute bucket kept, anything before it is pruned"""
+    now = timezone.now().replace(second=0, microsecond=0)
+    return now - timedelta(days=settings.MINUTE_ROLLUP_RETENTION_DAYS)
+
+
+def _upsert(model, keys, conflict, counts, rows):
+    """
+    Add the counts in ``rows`` onto ``model``, inserting the rows that don't exist yet,
+    with one multi-row statement (split only where SQLite's parameter limit requires).
+    """
+    if not rows:
+        return
+    # One statement may not touch a row twice, so rows sharing a conflict key are merged.
+    # Sorting them makes concurrent batches lock shared rows in the same order.
+    conflict_index = [keys.index(c) for c in conflict]
+    merged = {}
+    for row in rows:
+        key = tuple(row[i] for i in conflict_index)
+        if key in merged:
+            previous = merged[key]
+            row = row[:len(keys)] + tuple(a + b for a, b in zip(previous[len(keys):], row[len(keys):]))
+        merged[key] = row
+    rows = [merged[key] for key in sorted(merged, key=lambda key: tuple(str(part) for part in key))]
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = keys + counts
+    placeholder = f"({', '.join(['%s'] * len(columns))})"
+    batch_size = max(connection.ops.bulk_batch_size(columns, rows), 1)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            # Both PostgreSQL and SQLite support adding onto the existing row on conflict
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+                f"VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({', '.join(qn(c) for c in conflict)}) DO UPDATE SET "
+                + ', '.join(f"{qn(c)} = {table}.{qn(c)} + EXCLUDED.{qn(c)}" for c in counts),
+                [value for row in batch for value in row]
+            )
+
+
+class RollupDeltas:
+    """Accumulates per-message changes and upserts them into each rollup table in one statement per table"""
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: [0] * len(ROLLUP_COUNTS))
+        self.buckets = {model: defaultdict(int) for model in BUCKET_MODELS}
+        self.minute_cutoff = minute_rollup_cutoff()
+
+    def add(self, snapshot, is_bot, sign=1):
+        """Add (sign=1) or remove (sign=-1) one message, given its Message.aggregate_snapshot()"""
+        timestamp = snapshot['timestamp']
+        # Values assigned through the API may still be strings or naive at this point
+        if isinstance(timestamp, str):
+            timestamp = parse_datetime(timestamp)
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+        timestamp = timestamp.astimezone(dt_timezone.utc)
+        owner = (snapshot['guild_id'], snapshot['channel_id'], snapshot['author_id'], is_bot)
+
+        delta = self.deltas[(timestamp.date(),) + owner]
+        for i, value in enumerate((
+            1,
+            snapshot['word_count'] or 0,
+            snapshot['char_count'] or 0,
+            1 if snapshot['has_attachment'] else 0,
+            1 if snapshot['has_mention'] else 0,
+            1 if snapshot['has_emoji'] else 0,
+        )):
+            delta[i] += sign * value
+
+        minute = timestamp.replace(second=0, microsecond=0)
+        self.buckets[HourlyRollup][(minute.replace(minute=0),) + owner] += sign
+        # Backfilled history would only be pruned again
+        if minute >= self.minute_cutoff:
+            self.buckets[MinuteRollup][(minute,) + owner] += sign
+
+    def apply(self):
+        _upsert(
+            DailyRollup, ROLLUP_KEYS, ('date', 'channel_id', 'author_id'), ROLLUP_COUNTS,
+            [key + tuple(delta) for key, delta in self.deltas.items() if any(delta)]
+        )
+        self.deltas.clear()
+        adapt = connection.ops.adapt_datetimefield_value
+        for model, deltas in self.buckets.items():
+            _upsert(
+                model, BUCKET_KEYS, ('start', 'channel_id', 'author_id'), BUCKET_COUNTS,
+                [(adapt(key[0]),) + key[1:] + (count,) for key, count in deltas.items() if count]
+            )
+            deltas.clear()
+
+
+def _bulk_create(model, rows, batch_size):
+    created, batch = 0, []
+    for row in rows:
+        batch.append(model(**row))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def rebuild(since=None, batch_size=5000):
+    """Recompute every rollup table from the messages table, optionally only for dates >= ``since``"""
+    messages = Message.objects.all()
+    rollups = DailyRollup.objects.all()
+    if since:
+        messages = messages.filter(timestamp__date__gte=since)
+        rollups = rollups.filter(date__gte=since)
+
+    aggregates = (
+        messages
+        .order_by()
+        .values(
+            'channel_id',
+            'author_id',
+            'author__is_bot',
+            day=TruncDate('timestamp'),
+            message_guild=Coalesce('guild_id', 'channel__guild_id'),
+        )
+        .annotate(
+            messages=Count('id'),
+            words=Sum('word_count'),
+            chars=Sum('char_count'),
+            attachment_messages=Count('id', filter=Q(has_attachment=True)),
+            mention_messages=Count('id', filter=Q(has_mention=True)),
+            emoji_messages=Count('id', filter=Q(has_emoji=True)),
+        )
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        created = _bulk_create(DailyRollup, (
+            {
+                'date': row['day'],
+                'guild_id': row['message_guild'],
+                'channel_id': row['channel_id'],
+                'author_id': row['author_id'],
+                'is_bot': row['author__is_bot'],
+                'message_count': row['messages'],
+                'word_count': row['words'] or 0,
+                'char_count': row['chars'] or 0,
+                'attachment_count': row['attachment_messages'],
+                'mention_count': row['mention_messages'],
+                'emoji_count': row['emoji_messages'],
+            }
+            for row in aggregates.iterator(chunk_size=batch_size)
+        ), batch_size)
+
+        for model, trunc in BUCKET_MODELS.items():
+            buckets = model.objects.all()
+            bucket_messages = messages
+            if since:
+                buckets = buckets.filter(start__date__gte=since)
+            if model is MinuteRollup:
+                cutoff = minute_rollup_cutoff()
+                buckets = buckets.filter(start__gte=cutoff)
+                bucket_messages = bucket_messages.filter(timestamp__gte=cutoff)
+            buckets.delete()
+
+            aggregates = (
+                bucket_messages
+                .order_by()
+                .values(
+                    'channel_id',
+                    'author_id',
+                    'author__is_bot',
+                    bucket=trunc('timestamp'),
+                    message_guild=Coalesce('guild_id', 'channel__guild_id'),
+                )
+                .annotate(messages=Count('id'))
+            )
+            created += _bulk_create(model, (
+                {
+                    'start': row['bucket'],
+                    'guild_id': row['message_guild'],
+                    'channel_id': row['channel_id'],
+                    'author_id': row['author_id'],
+                    'is_bot': row['author__is_bot'],
+                    'message_count': row['messages'],
+                }
+                for row in aggregates.iterator(chunk_size=batch_size)
+            ), batch_size)
+
+        bump_generation()
+    return created
+
+
+def prune_minute_rollups():
+    """Delete minute buckets past MINUTE_ROLLUP_RETENTION_DAYS, returns the number of rows removed"""
+    deleted, _ = MinuteRollup.objects.filter(start__lt=minute_rollup_cutoff()).delete()
+    return deleted
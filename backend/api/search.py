@@ -0,0 +1,174 @@
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField, TextField, Value
+from django.db.models.expressions import RawSQL
+from .models import Message
+
+TABLE = Message._meta.db_table
+SEARCH_CONFIG = 'english'
+SNIPPET_START = '<mark>'
+SNIPPET_STOP = '</mark>'
+SNIPPET_RADIUS = 60
+
+_TOKEN = re.compile(r'(-?)"([^"]*)"|(\S+)')
+
+# External content FTS5 table kept in sync with the messages table by triggers
+SQLITE_FTS_TABLE = f'{TABLE}_fts'
+SQLITE_FTS_TRIGGERS = {
+    f'{TABLE}_fts_insert':
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_fts_insert AFTER INSERT ON {TABLE} BEGIN "
+        f"INSERT INTO {TABLE}_fts(rowid, content) VALUES (new.rowid, new.content); END",
+    f'{TABLE}_fts_delete':
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_fts_delete AFTER DELETE ON {TABLE} BEGIN "
+        f"INSERT INTO {TABLE}_fts({TABLE}_fts, rowid, content) VALUES ('delete', old.rowid, old.content); END",
+    f'{TABLE}_fts_update':
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_fts_update AFTER UPDATE OF content ON {TABLE} BEGIN "
+        f"INSERT INTO {TABLE}_fts({TABLE}_fts, rowid, content) VALUES ('delete', old.rowid, old.content); "
+        f"INSERT INTO {TABLE}_fts(rowid, content) VALUES (new.rowid, new.content); END",
+}
+
+
+def search_messages(queryset, query, mode='fts'):
+    """
+    Restrict ``queryset`` to messages matching ``query`` and annotate ``search_rank``
+    and ``search_snippet`` (content with matches wrapped in <mark>).
+
+    ``fts`` understands web search syntax: "quoted phrases", ``or`` and ``-excluded``
+    words. ``substring`` matches the raw text anywhere in the content, which is what
+    partial words, URLs and code need.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if mode == 'fts' and connection.vendor == 'postgresql':
+        return _postgres_fts(queryset, query)
+    if mode == 'fts' and connection.vendor == 'sqlite':
+        fts_query = to_fts5_query(query)
+        if fts_query:
+            return _sqlite_fts(queryset, fts_query)
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        queryset = _postgres_substring(queryset, query)
+    else:
+        # No index can serve a substring match here, this is a scan
+        queryset = queryset.filter(content__icontains=query)
+    return queryset.annotate(
+        search_rank=Value(1.0, output_field=FloatField()),
+        search_snippet=Value(None, output_field=TextField()),
+    )
+
+
+def _postgres_substring(queryset, query):
+    # icontains compiles to UPPER(content) LIKE UPPER(...), which the trigram index on
+    # the bare column can't serve; a plain ILIKE can
+    pattern = f'%{connection.ops.prep_for_like_query(query)}%'
+    return queryset.filter(RawSQL(f'"{TABLE}".content ILIKE %s', (pattern,), output_field=BooleanField()))
+
+
+def _postgres_fts(queryset, query):
+    tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+    return queryset.filter(
+        RawSQL(f'"{TABLE}".search_vector @@ {tsquery}', (query,), output_field=BooleanField())
+    ).annotate(
+        search_rank=RawSQL(f'ts_rank_cd("{TABLE}".search_vector, {tsquery})', (query,), output_field=FloatField()),
+        search_snippet=RawSQL(
+            f"ts_headline('{SEARCH_CONFIG}', \"{TABLE}\".content, {tsquery}, "
+            f"'StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxFragments=2')",
+            (query,),
+            output_field=TextField()
+        ),
+    )
+
+
+def _sqlite_fts(queryset, fts_query):
+    match = f'SELECT rowid FROM {TABLE}_fts WHERE {TABLE}_fts MATCH %s'
+    # bm25 is lower for better matches, negate it so higher ranks first like PostgreSQL
+    return queryset.filter(
+        RawSQL(f'"{TABLE}".rowid IN ({match})', (fts_query,), output_field=BooleanField())
+    ).annotate(
+        search_rank=RawSQL(
+            f'SELECT -bm25({TABLE}_fts) FROM {TABLE}_fts '
+            f'WHERE {TABLE}_fts MATCH %s AND {TABLE}_fts.rowid = "{TABLE}".rowid',
+            (fts_query,),
+            output_field=FloatField()
+        ),
+        search_snippet=RawSQL(
+            f"SELECT snippet({TABLE}_fts, 0, '{SNIPPET_START}', '{SNIPPET_STOP}', '...', 16) FROM {TABLE}_fts "
+            f'WHERE {TABLE}_fts MATCH %s AND {TABLE}_fts.rowid = "{TABLE}".rowid',
+            (fts_query,),
+            output_field=TextField()
+        ),
+    )
+
+
+def to_fts5_query(query):
+    """Translate web search syntax into an FTS5 expression with every term quoted"""
+    groups, current, excluded = [], [], []
+    for match in _TOKEN.finditer(query):
+        negated, phrase, word = match.groups()
+        if word and word.lower() == 'or':
+            if current:
+                groups.append(current)
+                current = []
+            continue
+        if word and word.startswith('-') and len(word) > 1:
+            negated, word = '-', word[1:]
+        term = (phrase if phrase is not None else word).replace('"', '""').strip()
+        if not term:
+            continue
+        (excluded if negated else current).append(f'"{term}"')
+    if current:
+        groups.append(current)
+    if not groups:
+        return ''
+
+    expression = ' OR '.join(f"({' AND '.join(group)})" for group in groups)
+    if excluded:
+        expression = f"({expression}) NOT ({' OR '.join(excluded)})"
+    return expression
+
+
+def highlight(content, query):
+    """Snippet around the first occurrence of ``query`` for substring matches"""
+    index = content.lower().find(query.lower())
+    if index < 0:
+        return None
+    start = max(index - SNIPPET_RADIUS, 0)
+    end = min(index + len(query) + SNIPPET_RADIUS, len(content))
+    return (
+        ('...' if start else '')
+        + content[start:index]
+        + SNIPPET_START + content[index:index + len(query)] + SNIPPET_STOP
+        + content[index + len(query):end]
+        + ('...' if end < len(content) else '')
+    )
+
+
+def ensure_sqlite_fts(connection):
+    """
+    Create the SQLite search table and its triggers where they are missing, and
+    reindex every message if anything had to be created.
+
+    SQLite applies most schema changes by copying the messages table, which drops
+    its triggers and can renumber its rowids, so this runs after every migrate.
+    Returns whether the index was rebuilt; a no-op on other databases.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s)" % ', '.join(['%s'] * (len(SQLITE_FTS_TRIGGERS) + 1)),
+            [SQLITE_FTS_TABLE, *SQLITE_FTS_TRIGGERS]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing >= {SQLITE_FTS_TABLE, *SQLITE_FTS_TRIGGERS}:
+            return False
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} "
+            f"USING fts5(content, content='{TABLE}', content_rowid='rowid')"
+        )
+        for statement in SQLITE_FTS_TRIGGERS.values():
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+    return True
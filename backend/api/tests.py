@@ -1,3 +1,282 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from . import rollups
+from .emojis import extract_emojis
+from .features import extract_features
+from .ingest import store_batch
+from .timeline import TimelineError, build_timeline, floor_to, parse_window, pick_resolution
+from .models import Channel, DailyRollup, DiscordUser, Guild, Message
+from .search import SQLITE_FTS_TRIGGERS, ensure_sqlite_fts, search_messages
 
-# Create your tests here.
+
+class MessageSearchTests(TestCase):
+    """The test database is migrated to HEAD, so these search the index migrations left behind"""
+
+    def setUp(self):
+        guild = Guild.objects.create(id='1', name='Guild')
+        channel = Channel.objects.create(id='2', guild=guild, name='general', type='text')
+        author = DiscordUser.objects.create(id='3', name='user', discriminator='0')
+        for i, content in enumerate(['the quick brown fox', 'a lazy dog', 'quick thinking']):
+            Message.objects.create(
+                id=str(10 + i), guild=guild, channel=channel, author=author,
+                type='Default', content=content, timestamp=timezone.now()
+            )
+
+    def search(self, query):
+        return set(search_messages(Message.objects.all(), query).values_list('id', flat=True))
+
+    def test_search_after_migrations(self):
+        self.assertEqual(self.search('quick'), {'10', '12'})
+        self.assertEqual(self.search('quick -fox'), {'12'})
+
+    def test_search_follows_edits_and_deletes(self):
+        Message.objects.filter(id='11').update(content='a quick dog')
+        Message.objects.filter(id='10').delete()
+        self.assertEqual(self.search('quick'), {'11', '12'})
+
+    def test_ensure_rebuilds_missing_triggers(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('The FTS5 index only exists on SQLite')
+        self.assertFalse(ensure_sqlite_fts(connection))
+
+        with connection.cursor() as cursor:
+            for name in SQLITE_FTS_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        Message.objects.filter(id='11').update(content='quick again')
+        self.assertEqual(self.search('quick'), {'10', '12'})
+
+        self.assertTrue(ensure_sqlite_fts(connection))
+        self.assertEqual(self.search('quick'), {'10', '11', '12'})
+
+
+class SearchMigrationTests(TransactionTestCase):
+    """Migrations after 0018 rebuild api_message on SQLite and must leave the index working"""
+
+    def test_search_after_migrating_from_0018(self):
+        # Without post_migrate, so only the migrations themselves restore the triggers
+        executor = MigrationExecutor(connection)
+        executor.migrate([('api', '0018_message_search')])
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes('api'))
+
+        guild = Guild.objects.create(id='1', name='Guild')
+        channel = Channel.objects.create(id='2', guild=guild, name='general', type='text')
+        author = DiscordUser.objects.create(id='3', name='user', discriminator='0')
+        Message.objects.create(
+            id='10', guild=guild, channel=channel, author=author,
+            type='Default', content='searchable after migrating', timestamp=timezone.now()
+        )
+        found = search_messages(Message.objects.all(), 'searchable').values_list('id', flat=True)
+        self.assertEqual(list(found), ['10'])
+
+
+def record(message_id, content, channel_id='2', author_id='3', day=1, timestamp=None):
+    """A store_batch record in the shape the bot and the importers produce"""
+    return {
+        'guild': {'id': '1', 'name': 'Guild'},
+        'channel': {'id': channel_id, 'name': f'channel-{channel_id}', 'type': 'text'},
+        'author': {'id': author_id, 'name': f'user-{author_id}', 'roles': None},
+        'message': {
+            'id': message_id, 'type': 'Default', 'content': content,
+            'timestamp': timestamp or datetime(2024, 1, day, 12, tzinfo=dt_timezone.utc),
+        },
+    }
+
+
+class StoreBatchTests(TestCase):
+    def rollup_counts(self):
+        return sorted(DailyRollup.objects.values_list('date', 'channel_id', 'author_id', 'message_count', 'word_count'))
+
+    def test_totals_and_rollups(self):
+        result = store_batch([
+            record('10', 'one two three'),
+            record('11', 'four five', channel_id='4'),
+            record('12', 'six', author_id='5', day=2),
+        ])
+        self.assertEqual(result, {'inserted': 3, 'skipped': 0})
+
+        channel = Channel.objects.get(pk='2')
+        self.assertEqual((channel.total_messages, channel.total_words), (2, 4))
+        user = DiscordUser.objects.get(pk='3')
+        self.assertEqual((user.total_messages, user.total_words), (2, 5))
+
+        # The incremental deltas must match a rebuild from the messages table
+        incremental = self.rollup_counts()
+        self.assertEqual(sum(row[3] for row in incremental), 3)
+        rollups.rebuild()
+        self.assertEqual(self.rollup_counts(), incremental)
+
+    def test_redelivery_counts_once(self):
+        store_batch([record('10', 'one two three')])
+        result = store_batch([record('10', 'one two three'), record('11', 'four')])
+        self.assertEqual(result, {'inserted': 1, 'skipped': 1})
+        # A message repeated inside one batch is stored once too
+        result = store_batch([record('12', 'five'), record('12', 'five')])
+        self.assertEqual(result, {'inserted': 1, 'skipped': 0})
+
+        channel = Channel.objects.get(pk='2')
+        self.assertEqual((channel.total_messages, channel.total_words), (3, 5))
+        self.assertEqual(DiscordUser.objects.get(pk='3').total_messages, 3)
+        self.assertEqual(DailyRollup.objects.get().message_count, 3)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        guild = Guild.objects.create(id='1', name='Guild')
+        channel = Channel.objects.create(id='2', guild=guild, name='general', type='text')
+        author = DiscordUser.objects.create(id='3', name='user', discriminator='0')
+        shared = datetime(2024, 1, 1, 12, tzinfo=dt_timezone.utc)
+        # Most messages share one timestamp, only the ID keeps their order stable
+        for i in range(7):
+            Message.objects.create(
+                id=str(20 + i), guild=guild, channel=channel, author=author, type='Default',
+                content=f'message {i}', timestamp=shared if i < 5 else shared.replace(hour=13 + i)
+            )
+        self.expected = ['26', '25', '24', '23', '22', '21', '20']
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()['results']])
+            url = response.json()[link]
+        return pages
+
+    def test_pages_cover_equal_timestamps_once(self):
+        pages = self.walk('/api/database/messages/?pagination=cursor&page_size=2', 'next')
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual([message_id for page in pages for message_id in page], self.expected)
+
+    def test_previous_pages_mirror_next_pages(self):
+        response = self.client.get('/api/database/messages/?pagination=cursor&page_size=2')
+        for _ in range(3):
+            response = self.client.get(response.json()['next'])
+        self.assertEqual([row['id'] for row in response.json()['results']], ['20'])
+
+        pages = self.walk(response.json()['previous'], 'previous')
+        self.assertEqual(pages, [['22', '21'], ['24', '23'], ['26', '25']])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/database/messages/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class TimelineTests(TestCase):
+    def test_parse_window(self):
+        self.assertEqual(parse_window('90m'), timedelta(minutes=90))
+        self.assertEqual(parse_window('2W'), timedelta(weeks=2))
+        for value in ('0h', '24', 'h', '1y'):
+            with self.assertRaises(TimelineError):
+                parse_window(value)
+
+    def test_floor_to(self):
+        moment = datetime(2024, 1, 4, 13, 45, 30, tzinfo=dt_timezone.utc)
+        self.assertEqual(floor_to(moment, 'minute'), moment.replace(second=0))
+        self.assertEqual(floor_to(moment, 'hour'), moment.replace(minute=0, second=0))
+        self.assertEqual(floor_to(moment, 'day'), datetime(2024, 1, 4, tzinfo=dt_timezone.utc))
+        # 2024-01-04 is a Thursday
+        self.assertEqual(floor_to(moment, 'week'), datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+
+    def test_pick_resolution(self):
+        now = timezone.now()
+        self.assertEqual(pick_resolution(now - timedelta(hours=24), now, 'minute'), 'minute')
+        # Too many minute buckets for two days
+        self.assertEqual(pick_resolution(now - timedelta(days=2), now, 'minute'), 'hour')
+        # Minute rollups are pruned past the retention, whatever the point count
+        old = now - timedelta(days=365)
+        self.assertEqual(pick_resolution(old, old + timedelta(minutes=5), 'minute'), 'hour')
+        self.assertEqual(pick_resolution(now - timedelta(days=90), now, 'hour'), 'hour')
+        self.assertEqual(pick_resolution(now - timedelta(days=365), now, 'hour'), 'day')
+        self.assertEqual(pick_resolution(now - timedelta(days=365 * 20), now, 'day'), 'week')
+
+    def test_buckets(self):
+        end = floor_to(timezone.now(), 'hour') - timedelta(minutes=1)
+        start = end - timedelta(hours=3)
+        store_batch([
+            record('10', 'a', timestamp=end - timedelta(minutes=1)),
+            record('11', 'b', timestamp=end - timedelta(minutes=2)),
+            record('12', 'c', author_id='5', timestamp=end - timedelta(hours=2)),
+        ])
+
+        hourly = build_timeline(start, end, 'hour')
+        self.assertEqual(hourly['resolution'], 'hour')
+        self.assertEqual(hourly['step'], 3600)
+        self.assertEqual(hourly['start'], floor_to(start, 'hour').isoformat())
+        self.assertEqual(hourly['counts'], [0, 1, 0, 2])
+        self.assertEqual(build_timeline(start, end, 'hour', user_ids=['5'])['counts'], [0, 1, 0, 0])
+
+        minutes = build_timeline(start, end, 'minute')
+        self.assertEqual(minutes['resolution'], 'minute')
+        self.assertEqual(len(minutes['counts']), 181)
+        self.assertEqual(minutes['counts'][-3:], [1, 1, 0])
+
+        # Incremental updates only return the buckets from the one containing since
+        recent = build_timeline(start, end, 'hour', since=end - timedelta(minutes=30))
+        self.assertEqual(recent['counts'], [2])
+        self.assertEqual(recent['window_start'], hourly['start'])
+
+
+class ExtractEmojisTests(TestCase):
+    def codes(self, content):
+        return [emoji['code'] for emoji in extract_emojis(content)]
+
+    def test_zwj_sequence_is_one_emoji(self):
+        family = '\U0001F468\u200d\U0001F469\u200d\U0001F467\u200d\U0001F466'
+        self.assertEqual(self.codes(f'hi {family} there'), ['1f468-200d-1f469-200d-1f467-200d-1f466'])
+
+    def test_skin_tones(self):
+        self.assertEqual(self.codes('\U0001F44D\U0001F3FD'), ['1f44d-1f3fd'])
+        # A skin tone inside a ZWJ sequence
+        self.assertEqual(self.codes('\U0001F469\U0001F3FD\u200d\U0001F4BB'), ['1f469-1f3fd-200d-1f4bb'])
+
+    def test_flags(self):
+        self.assertEqual(self.codes('\U0001F1FA\U0001F1F8\U0001F1EB\U0001F1F7'), ['1f1fa-1f1f8', '1f1eb-1f1f7'])
+        scotland = '\U0001F3F4\U000E0067\U000E0062\U000E0073\U000E0063\U000E0074\U000E007F'
+        self.assertEqual(self.codes(scotland), ['1f3f4-e0067-e0062-e0073-e0063-e0074-e007f'])
+
+    def test_keycaps_but_not_plain_digits(self):
+        self.assertEqual(self.codes('1\ufe0f\u20e3 #\u20e3 123 #tag *bold*'), ['31-20e3', '23-20e3'])
+
+    def test_variation_selector_is_optional(self):
+        self.assertEqual(self.codes('\u2764\ufe0f \u2764'), ['2764', '2764'])
+
+    def test_custom_emojis(self):
+        emojis = extract_emojis('<:pepe:123456789012345678> and <a:dance:123456789012345679>')
+        self.assertEqual([(e['name'], e['id'], e['isAnimated'], e['code']) for e in emojis], [
+            ('pepe', '123456789012345678', False, None),
+            ('dance', '123456789012345679', True, None),
+        ])
+        self.assertEqual(emojis[1]['imageUrl'], 'https://cdn.discordapp.com/emojis/123456789012345679.gif')
+
+    def test_plain_text(self):
+        self.assertEqual(extract_emojis(''), [])
+        self.assertEqual(extract_emojis('no emoji here: <:x:1>'), [])
+
+
+class ExtractFeaturesTests(TestCase):
+    def test_counts(self):
+        features = extract_features('Check https://example.com and ```print(1)``` now now')
+        self.assertEqual(features['url_count'], 1)
+        self.assertEqual(features['code_block_count'], 1)
+        self.assertEqual(features['word_count'], 6)
+        self.assertEqual(features['unique_token_count'], features['token_count'] - 1)
+
+    def test_cjk_tokens(self):
+        # One token per ideograph or kana, words in spaced scripts stay whole
+        features = extract_features('今日は hello 今')
+        self.assertEqual(features['token_count'], 5)
+        self.assertEqual(features['unique_token_count'], 4)
+        self.assertEqual(features['word_count'], 3)
+
+    def test_commands(self):
+        for content in ('!play some song', '/shrug', '  $balance'):
+            self.assertTrue(extract_features(content)['is_command'], content)
+        for content in ('-ok', '.net is nice', '/r/python', '!!!', '!1', 'hello !play', ''):
+            self.assertFalse(extract_features(content)['is_command'], content)
+
+    def test_empty_content(self):
+        self.assertEqual(extract_features(None)['token_count'], 0)
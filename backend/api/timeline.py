@@ -0,0 +1,128 @@
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db.models import Sum
+from django.utils import timezone
+from .models import DailyRollup, HourlyRollup, MinuteRollup
+from .rollups import minute_rollup_cutoff
+
+# Resolution -> bucket length, in the order downsampling walks through them
+RESOLUTIONS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+# Enough for 90 days at hourly resolution
+MAX_POINTS = 2500
+
+_WINDOW = re.compile(r'^(\d+)([mhdw])$')
+_WINDOW_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+class TimelineError(ValueError):
+    pass
+
+
+def parse_window(value):
+    """'30m', '24h', '90d' or '2w' as a timedelta"""
+    match = _WINDOW.match(value.strip().lower())
+    if not match or not int(match.group(1)):
+        raise TimelineError('window must look like 30m, 24h, 90d or 2w')
+    return timedelta(**{_WINDOW_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def floor_to(moment, resolution):
+    """Start of the UTC bucket containing ``moment``, weeks start on Monday"""
+    moment = moment.astimezone(dt_timezone.utc)
+    if resolution == 'minute':
+        return moment.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime.combine(moment.date(), time.min, tzinfo=dt_timezone.utc)
+    if resolution == 'week':
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def pick_resolution(start, end, resolution):
+    """
+    The requested resolution, or the next coarser one while the window would need
+    more than MAX_POINTS buckets or reaches past the minute rollup retention.
+    """
+    names = list(RESOLUTIONS)
+    for name in names[names.index(resolution):]:
+        if name == 'minute' and start < minute_rollup_cutoff():
+            continue
+        if (end - floor_to(start, name)) // RESOLUTIONS[name] < MAX_POINTS:
+            return name
+    return names[-1]
+
+
+def build_timeline(start, end, resolution, guild_ids=None, channel_ids=None, user_ids=None, exclude_bots=False,
+                   since=None):
+    """
+    Message counts between ``start`` and ``end`` as one integer per bucket, read from
+    the rollup table matching the resolution. ``None`` id lists mean no filter.
+
+    With ``since`` only the buckets from the one containing ``since`` on are read and
+    returned, at the resolution the whole window would use; ``window_start`` tells
+    the client where its copy of the series now begins.
+    """
+    resolution = pick_resolution(start, end, resolution)
+    step = RESOLUTIONS[resolution]
+    window_start = floor_to(start, resolution)
+    first = max(window_start, floor_to(since, resolution)) if since else window_start
+    counts = [0] * ((floor_to(end, resolution) - first) // step + 1)
+
+    if resolution in ('minute', 'hour'):
+        model = MinuteRollup if resolution == 'minute' else HourlyRollup
+        rows = model.objects.filter(start__gte=first, start__lte=end)
+        bucket = 'start'
+    else:
+        rows = DailyRollup.objects.filter(date__gte=first.date(), date__lte=end.date())
+        bucket = 'date'
+    if guild_ids is not None:
+        rows = rows.filter(guild_id__in=guild_ids)
+    if channel_ids is not None:
+        rows = rows.filter(channel_id__in=channel_ids)
+    if user_ids is not None:
+        rows = rows.filter(author_id__in=user_ids)
+    if exclude_bots:
+        rows = rows.filter(is_bot=False)
+
+    for value, count in rows.order_by().values(bucket).annotate(count=Sum('message_count')).values_list(bucket, 'count'):
+        if bucket == 'date':
+            value = datetime.combine(value, time.min, tzinfo=dt_timezone.utc)
+        counts[(value.astimezone(dt_timezone.utc) - first) // step] += count
+
+    return {
+        'start': first.isoformat(),
+        'step': int(step.total_seconds()),
+        'resolution': resolution,
+        'counts': counts,
+        'window_start': window_start.isoformat(),
+    }
+
+
+def parse_range(params, now=None):
+    """(start, end) from either ``start``/``end`` ISO datetimes or a ``window`` ending now"""
+    now = now or timezone.now()
+    end = _parse_datetime(params.get('end'), 'end') or now
+    start = _parse_datetime(params.get('start'), 'start')
+    if start is None:
+        start = end - parse_window(params.get('window') or '24h')
+    if start >= end:
+        raise TimelineError('start must be before end')
+    return start, end
+
+
+def _parse_datetime(value, name):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise TimelineError(f'{name} must be an ISO 8601 datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
@@ -0,0 +1,61 @@
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import Channel, DiscordUser, Message
+
+TOTAL_FIELDS = ('total_messages', 'total_words', 'total_characters')
+
+# Model -> the Message foreign key its totals are aggregated over
+TOTALS_MODELS = {
+    Channel: 'channel_id',
+    DiscordUser: 'author_id',
+}
+
+
+def expected_totals(model):
+    """Aggregate the real totals for every row of ``model`` in a single GROUP BY"""
+    group_field = TOTALS_MODELS[model]
+    rows = (
+        Message.objects
+        .order_by()
+        .values(group_field)
+        .annotate(
+            total_messages=Count('id'),
+            total_words=Sum('word_count'),
+            total_characters=Sum('char_count')
+        )
+    )
+    return {
+        row[group_field]: tuple(row[field] or 0 for field in TOTAL_FIELDS)
+        for row in rows
+    }
+
+
+def find_drift(model):
+    """Return [(obj, stored, expected)] for rows whose stored totals disagree with their messages"""
+    expected = expected_totals(model)
+    drift = []
+    for obj in model.objects.only('id', *TOTAL_FIELDS).iterator(chunk_size=2000):
+        stored = tuple(getattr(obj, field) for field in TOTAL_FIELDS)
+        actual = expected.get(obj.id, (0, 0, 0))
+        if stored != actual:
+            drift.append((obj, stored, actual))
+    return drift
+
+
+def repair_drift(model, drift, batch_size=1000):
+    """Overwrite drifted rows with their expected totals"""
+    for obj, _, actual in drift:
+        for field, value in zip(TOTAL_FIELDS, actual):
+            setattr(obj, field, value)
+    model.objects.bulk_update([obj for obj, _, _ in drift], TOTAL_FIELDS, batch_size=batch_size)
+
+
+def rebuild_totals(model):
+    """Recompute the totals of every row of ``model`` in one UPDATE of correlated aggregates"""
+    group_field = TOTALS_MODELS[model]
+    messages = Message.objects.filter(**{group_field: OuterRef('pk')}).order_by().values(group_field)
+    return model.objects.update(
+        total_messages=Coalesce(Subquery(messages.annotate(value=Count('id')).values('value')), 0),
+        total_words=Coalesce(Subquery(messages.annotate(value=Sum('word_count')).values('value')), 0),
+        total_characters=Coalesce(Subquery(messages.annotate(value=Sum('char_count')).values('value')), 0),
+    )
@@ -9,6 +9,7 @@ from .view.MessageTimelineView import MessageTimelineView
 from .view.MessagesStatsView import MessagesStatsView
 from .view.AverageMessageView import AverageMessageView 
 from .view.ChannelProfileView import ChannelProfileView
+from .view.LiveView import live_feed
 
 router = routers.DefaultRouter()
 router.register(r'messages', MessageViewSet)
@@ -27,5 +28,6 @@ urlpatterns = [
     path('channel/<str:channel_name>/', ChannelProfileView.as_view(), name='channel-profile'),
     path('user-messages-stats/<str:username>/', UserMessageSums.as_view(), name='user-messages-stats'),
     path('stats/average-message/', AverageMessageView.as_view(), name='message-length-stats'),
+    path('live/', live_feed, name='live-feed'),
 ] + router.urls
 
@@ -3,13 +3,15 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from ..models import Channel
+from ..resolvers import Resolver
 
 class ChannelProfileView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, channel_name):
         try:
-            channel = Channel.objects.get(name=channel_name)
+            # Accepts the channel ID or its name
+            channel = Channel.objects.select_related('guild').get(pk=Resolver(Channel).resolve_one(channel_name))
             data = {
                 'id': channel.id,
                 'name': channel.name,
@@ -2,12 +2,16 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.db.models import Count, Sum, F, Q
-from ..models import Channel, Message
+from django.db.models import Count, Sum, F, Q, Window
+from django.db.models.functions import RowNumber
+from ..models import Channel, DiscordUser, Message, DailyRollup
+from ..cache import cache_stats
+from ..resolvers import resolvers
 
 class ChannelsStatsView(APIView):
     permission_classes = [AllowAny]
 
+    @cache_stats
     def get(self, request):
         # Get excluded users from query params
         excluded_users = request.query_params.get('exclude_user', '').split(',')
@@ -20,98 +24,71 @@ class ChannelsStatsView(APIView):
         # Get bot exclusion parameter
         exclude_bots = request.query_params.get('exclude_bots', '').lower() == 'true'
 
-        # Build base message filter
-        message_filter = Q()
-        if excluded_users:
-            message_filter &= ~Q(messages__author__name__in=excluded_users)
-        if exclude_bots:
-            message_filter &= ~Q(messages__author__is_bot=True)
+        # Exclusions accept IDs or names, and filter on the foreign keys
+        resolve = resolvers()
 
-        # Base queryset excluding specified channels
-        base_query = Channel.objects
+        # Aggregate the daily rollups per channel with the same exclusions
+        rollups = DailyRollup.objects.all()
         if excluded_channels:
-            base_query = base_query.exclude(name__in=excluded_channels)
+            rollups = rollups.exclude(channel_id__in=resolve['channel'].resolve(excluded_channels))
+        if excluded_users:
+            rollups = rollups.exclude(author_id__in=resolve['user'].resolve(excluded_users))
+        if exclude_bots:
+            rollups = rollups.filter(is_bot=False)
 
-        # Get channel stats with annotations
         channel_stats = (
-            base_query
+            rollups
+            .order_by()
+            .values('channel_id', name=F('channel__name'))
             .annotate(
-                filtered_messages=Count(
-                    'messages',
-                    filter=message_filter
-                ),
-                filtered_words=Sum(
-                    'messages__word_count',
-                    filter=message_filter
-                ),
-                filtered_chars=Sum(
-                    'messages__char_count',
-                    filter=message_filter
-                ),
-                attachments_count=Count(
-                    'messages',
-                    filter=message_filter & ~Q(messages__attachments=[])
-                ),
-                mentions_count=Count(
-                    'messages',
-                    filter=message_filter & ~Q(messages__mentions=[])
-                ),
-                emoji_count=Count(
-                    'messages',
-                    filter=message_filter & ~Q(messages__inline_emojis=[])
-                )
-            )
-            .values(
-                'name',
-                'filtered_messages',
-                'filtered_words',
-                'filtered_chars',
-                'attachments_count',
-                'mentions_count',
-                'emoji_count'
+                filtered_messages=Sum('message_count'),
+                filtered_words=Sum('word_count'),
+                filtered_chars=Sum('char_count'),
+                attachments_count=Sum('attachment_count'),
+                mentions_count=Sum('mention_count'),
+                emoji_count=Sum('emoji_count')
             )
         )
 
-        # Calculate total stats with all filters applied
-        total_stats_filter = Q()
-        if excluded_channels:
-            total_stats_filter &= ~Q(channel__name__in=excluded_channels)
-        if excluded_users:
-            total_stats_filter &= ~Q(author__name__in=excluded_users)
-        if exclude_bots:
-            total_stats_filter &= ~Q(author__is_bot=True)
-
-        total_stats = Message.objects.filter(total_stats_filter).aggregate(
-            total_messages=Count('id'),
+        total_stats = rollups.aggregate(
+            total_messages=Sum('message_count'),
             total_words=Sum('word_count'),
             total_characters=Sum('char_count')
         )
+        total_stats['total_messages'] = total_stats['total_messages'] or 0
+
+        # Every channel's most active user from one ranked query, grouped on the user ID
+        # so users sharing a name stay apart
+        most_active = {
+            row['channel_id']: row
+            for row in (
+                rollups
+                .order_by()
+                .values('channel_id', 'author_id')
+                .annotate(count=Sum('message_count'))
+                .annotate(rank=Window(
+                    RowNumber(),
+                    partition_by=F('channel_id'),
+                    order_by=[F('count').desc(), F('author_id').asc()]
+                ))
+                .filter(rank=1)
+            )
+        }
+        user_names = dict(
+            DiscordUser.objects
+            .filter(pk__in=[row['author_id'] for row in most_active.values()])
+            .values_list('pk', 'name')
+        )
 
         results = []
         for channel in channel_stats:
-            if channel['filtered_messages'] == 0:
+            if not channel['filtered_messages']:
                 continue
 
-            # Build user stats filter
-            user_filter = Q(channel__name=channel['name'])
-            if excluded_users:
-                user_filter &= ~Q(author__name__in=excluded_users)
-            if exclude_bots:
-                user_filter &= ~Q(author__is_bot=True)
-
-            # Get most active user with proper exclusions
-            user_stats = (
-                Message.objects
-                .filter(user_filter)
-                .values('author__name')
-                .annotate(count=Count('id'))
-                .order_by('-count')
-                .first()
-            )
-
-            if user_stats:
+            user_stats = most_active.get(channel['channel_id'])
+            if user_stats and user_stats['count']:
                 user_percentage = (user_stats['count'] / channel['filtered_messages']) * 100
-                most_active_user = user_stats['author__name']
+                most_active_user = user_names.get(user_stats['author_id'], 'unknown')
             else:
                 user_percentage = 0
                 most_active_user = 'unknown'
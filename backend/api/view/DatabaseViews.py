@@ -1,33 +1,147 @@
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from ..models import Message
 from django.shortcuts import get_object_or_404
 from datetime import datetime, timedelta
 import pytz
+import base64
+import json
+from django.db import connection
 from django.db.models import Q, Prefetch, Count
+from django.utils.dateparse import parse_datetime
 from ..models import Message, Guild, Channel, DiscordUser
+from ..search import search_messages, highlight
+from ..resolvers import resolvers
+from ..features import FEATURE_FIELDS
 
 class MessagePagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
+class MessageCursorPagination:
+    """
+    Keyset pagination over (timestamp, id), newest first.
+
+    Each page continues strictly after the row the cursor points at instead of
+    using OFFSET, so deep pages cost the same as the first one. ``count`` picks
+    how the total is reported: ``none`` (default), ``estimate`` (the planner's
+    row estimate on PostgreSQL) or ``exact``.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    ordering = ('-timestamp', '-id')
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        self.count = self.get_count(queryset, request.query_params.get('count', 'none'))
+
+        page_size = self.get_page_size(request)
+        timestamp, message_id, reverse = self.decode_cursor(request)
+
+        if timestamp is None:
+            rows = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        elif not reverse:
+            rows = list(
+                queryset
+                .filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id))
+                .order_by(*self.ordering)[:page_size + 1]
+            )
+        else:
+            rows = list(
+                queryset
+                .filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=message_id))
+                .order_by('timestamp', 'id')[:page_size + 1]
+            )
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, timestamp is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_count(self, queryset, mode):
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            if connection.vendor == 'postgresql':
+                plan = json.loads(queryset.order_by().explain(format='json'))
+                return int(plan[0]['Plan']['Plan Rows'])
+            return queryset.count()
+        return None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            timestamp = parse_datetime(position['t'])
+            if timestamp is None:
+                raise ValueError
+            return timestamp, str(position['i']), bool(position.get('r'))
+        except (KeyError, TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, row, reverse):
+        position = {'t': row['timestamp'].isoformat(), 'i': row['id'], 'r': int(reverse)}
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.encode_cursor(self.page[-1], False) if self.has_next and self.page else None,
+            'previous': self.encode_cursor(self.page[0], True) if self.has_previous and self.page else None,
+            'results': data
+        })
+
 class DatabaseView(APIView):
     permission_classes = [AllowAny]
     pagination_class = MessagePagination
+    cursor_pagination_class = MessageCursorPagination
 
     def get(self, request):
         filters = Q()
         params = request.query_params
+
+        # Keyset pagination avoids COUNT(*) and OFFSET scans, page numbers stay for compatibility
+        use_cursor = params.get('pagination') == 'cursor' or 'cursor' in params
+        # Cursors continue from a (timestamp, id) position, which a rank ordering doesn't have
+        if use_cursor and params.get('sort') == 'relevance':
+            return Response(
+                {'error': 'sort=relevance only works with page number pagination'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
+        # IDs or names, resolved up front so the filters hit the foreign key indexes
+        resolve = resolvers()
         if server := params.get('server'):
-            filters &= Q(guild__name=server)
+            filters &= Q(guild_id__in=resolve['guild'].resolve([server]))
         if channel := params.get('channel'):
-            filters &= Q(channel__name=channel)
+            filters &= Q(channel_id__in=resolve['channel'].resolve([channel]))
         if user := params.get('user'):
-            filters &= Q(author__name=user)
+            filters &= Q(author_id__in=resolve['user'].resolve([user]))
         if date := params.get('date'):
             try:
                 timezone_name = params.get('timezone', 'UTC')
@@ -55,11 +169,11 @@ class DatabaseView(APIView):
         # Combine all attachment/mention/emoji filters
         content_filters = []
         if params.get('has_attachment') == 'true':
-            content_filters.append(~Q(attachments=[]))
+            content_filters.append(Q(has_attachment=True))
         if params.get('has_mention') == 'true':
-            content_filters.append(~Q(mentions=[]))
+            content_filters.append(Q(has_mention=True))
         if params.get('has_emoji') == 'true':
-            content_filters.append(~Q(inline_emojis=[]))
+            content_filters.append(Q(has_emoji=True))
         
         if content_filters:
             filters &= Q(*content_filters, _connector=Q.AND)
@@ -70,22 +184,36 @@ class DatabaseView(APIView):
             .select_related('guild', 'channel', 'author')
             .filter(filters)
             .order_by('-timestamp')
-            .values(
-                'id',
-                'guild__name',
-                'channel__name',
-                'author__name',
-                'timestamp',
-                'char_count',
-                'word_count',
-                'attachments',
-                'mentions',
-                'inline_emojis',
-                'content'
-            )
         )
+        fields = [
+            'id',
+            'guild__name',
+            'channel__name',
+            'author__name',
+            'timestamp',
+            'char_count',
+            'word_count',
+            'has_attachment',
+            'has_mention',
+            'has_emoji',
+            'inline_emojis',
+            'content'
+        ]
+
+        # Content search through the full-text index
+        query = params.get('q', '').strip()
+        if query:
+            messages = search_messages(messages, query, params.get('search', 'fts'))
+            fields += ['search_rank', 'search_snippet']
+            if params.get('sort') == 'relevance':
+                messages = messages.order_by('-search_rank', '-timestamp')
+
+        messages = messages.values(*fields)
 
-        paginator = self.pagination_class()
+        if use_cursor:
+            paginator = self.cursor_pagination_class()
+        else:
+            paginator = self.pagination_class()
         page = paginator.paginate_queryset(messages, request)
 
         data = [{
@@ -96,11 +224,15 @@ class DatabaseView(APIView):
             'timestamp': msg['timestamp'],
             'char_count': msg['char_count'],
             'word_count': msg['word_count'],
-            'contains_attachment': bool(msg['attachments']),
-            'contains_mention': bool(msg['mentions']),
-            'contains_emoji': bool(msg['inline_emojis']),
+            'contains_attachment': msg['has_attachment'],
+            'contains_mention': msg['has_mention'],
+            'contains_emoji': msg['has_emoji'],
             'emojis_used': msg['inline_emojis'],
             'message_content': msg['content'],
+            **({
+                'rank': msg['search_rank'],
+                'snippet': msg['search_snippet'] or highlight(msg['content'], query),
+            } if query else {}),
         } for msg in page]
 
         return paginator.get_paginated_response(data)
@@ -161,7 +293,9 @@ class DatabaseMessageDetailView(APIView):
             'embeds': message.embeds,
             'stickers': message.stickers,
             'mentions': message.mentions,
-            'inline_emojis': message.inline_emojis
+            'inline_emojis': message.inline_emojis,
+            # Stored at ingest by api.features
+            'features': {field: getattr(message, field) for field in FEATURE_FIELDS}
         })
 
     def put(self, request, pk):
@@ -0,0 +1,37 @@
+import json
+import time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from ..live import broker
+
+# Comment lines keep proxies from closing an idle stream
+HEARTBEAT_SECONDS = 15
+
+
+async def live_feed(request):
+    """
+    Server-Sent Events stream of new messages (``message``) and stat deltas
+    (``stats``, ``timeline``, ``channels``). A ``resync`` event means this client
+    fell behind and should refetch. Streams end after LIVE_MAX_CONNECTION_SECONDS
+    and the browser's EventSource reconnects on its own.
+    """
+    async def stream():
+        subscriber = broker.subscribe()
+        deadline = time.monotonic() + settings.LIVE_MAX_CONNECTION_SECONDS
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                events = await subscriber.next_events(HEARTBEAT_SECONDS)
+                if not events:
+                    yield ': keepalive\n\n'
+                for event, data in events:
+                    yield f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+        finally:
+            broker.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,62 +1,49 @@
-from django.shortcuts import render
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.db.models import Count
-from django.db.models.functions import TruncMinute
-from django.utils import timezone
-from ..models import Message
+from ..cache import cache_stats
+from ..deltas import DeltaError, latest_position, parse_since
+from ..resolvers import resolvers
+from ..timeline import RESOLUTIONS, TimelineError, build_timeline, parse_range
 
 class MessageTimelineView(APIView):
     permission_classes = [AllowAny]
 
+    @cache_stats
     def get(self, request):
-        # Get current time in UTC
-        now = timezone.now()
-        start_time = now - timezone.timedelta(hours=24)
-
-        # Get message counts by minute
-        message_counts = (
-            Message.objects
-            .filter(timestamp__gte=start_time)
-            .annotate(
-                minute=TruncMinute('timestamp')
+        # Either ?window=24h ending now, or an explicit ?start=...&end=... range
+        try:
+            start, end = parse_range(request.query_params)
+        except TimelineError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        resolution = request.query_params.get('resolution', 'minute').lower()
+        if resolution not in RESOLUTIONS:
+            return Response(
+                {'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            .values('minute')
-            .annotate(count=Count('id'))
-            .order_by('minute')
-        )
-
-        # Create a minute-by-minute lookup, staying in UTC
-        count_lookup = {
-            m['minute'].isoformat(): m['count']
-            for m in message_counts
-        }
-
-        # Generate all minutes in UTC
-        intervals = []
-        current = start_time.replace(second=0, microsecond=0)
-        end_time = now.replace(second=0, microsecond=0)
-
-        while current <= end_time:
-            intervals.append({
-                'timestamp': current.isoformat(),
-                'count': count_lookup.get(current.isoformat(), 0)
-            })
-            current += timezone.timedelta(minutes=1)
-
-        # Add debug information
-        total_messages = sum(count_lookup.values())
-        active_minutes = sum(1 for count in count_lookup.values() if count > 0)
 
-        return Response({
-            'intervals': intervals,
-            'debug_info': {
-                'now': now.isoformat(),
-                'start_time': start_time.isoformat(),
-                'end_time': end_time.isoformat(),
-                'total_messages': total_messages,
-                'unique_minutes': active_minutes,
-                'sample_counts': dict(list(count_lookup.items())[:5]),
-            }
-        })
\ No newline at end of file
+        # Filters accept IDs or names, like the exclusions on the other stats endpoints
+        resolve = resolvers()
+        filters = {}
+        for param, name in (('guild', 'guild_ids'), ('channel', 'channel_ids'), ('user', 'user_ids')):
+            values = [v.strip() for v in request.query_params.get(param, '').split(',') if v.strip()]
+            if values:
+                filters[name] = resolve[param].resolve(values)
+        exclude_bots = request.query_params.get('exclude_bots', '').lower() == 'true'
+
+        # With ?since=<message id or timestamp> only the buckets that can have changed are sent
+        since = None
+        if request.query_params.get('since'):
+            try:
+                since = parse_since(request.query_params['since'])[0]
+            except DeltaError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        latest = latest_position()
+
+        # Compact response: bucket i covers start + i * step seconds
+        timeline = build_timeline(start, end, resolution, exclude_bots=exclude_bots, since=since, **filters)
+        timeline['cursor'] = latest[1] if latest else None
+        return Response(timeline)
@@ -1,13 +1,32 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.contrib.humanize.templatetags.humanize import naturaltime
 from ..models import Message, DiscordUser
 from ..serializers import MessageSerializer
+from ..cache import cache_stats
+from ..deltas import DeltaError, between, latest_position, parse_since
 from django.db.models import F
 from django.db.models.functions import Length
-import re
+
+
+def recent_message_data(message):
+    """Recent messages entry, shared with the live feed"""
+    return {
+        'id': message.id,
+        'user_name': message.author.name,
+        'nickname': message.author.nickname,
+        'user_id': message.author.id,
+        'channel_name': message.channel.name,
+        'timestamp': message.timestamp,
+        'relative_time': naturaltime(message.timestamp),
+        'char_count': message.char_count,
+        'word_count': message.word_count,
+        'message_content': message.content,
+        'avatar': message.author.avatar_url
+    }
+
 
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
@@ -17,30 +36,25 @@ class MessageViewSet(viewsets.ModelViewSet):
 class RecentMessagesView(APIView):
     permission_classes = [AllowAny]
     
+    @cache_stats
     def get(self, request):
-        # Get the last 100 messages
-        messages = Message.objects.select_related(
-            'author', 'channel'
-        ).order_by('-timestamp')[:75]
-        
-        def count_words(text):
-            return len(re.findall(r'\w+', text))
-        
-        message_data = []
-        for message in messages:
-            message_data.append({
-                'id': message.id,
-                'user_name': message.author.name,
-                'nickname': message.author.nickname,
-                'user_id': message.author.id,
-                'channel_name': message.channel.name,
-                'timestamp': message.timestamp,
-                'relative_time': naturaltime(message.timestamp),
-                'char_count': len(message.content),
-                'word_count': count_words(message.content),
-                'message_content': message.content,
-                'avatar': message.author.avatar_url
-            })
+        latest = latest_position()
+        messages = Message.objects.select_related('author', 'channel')
+
+        # With ?since=<message id or timestamp> only messages stored after it are sent
+        if request.query_params.get('since'):
+            try:
+                since = parse_since(request.query_params['since'])
+            except DeltaError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if not latest:
+                return Response({'messages': [], 'cursor': None})
+            messages = between(messages, since, latest)
+
+        # Get the last 75 messages
+        messages = messages.order_by('-timestamp', '-id')[:75]
         
-        return Response({'messages': message_data})
+        message_data = [recent_message_data(message) for message in messages]
+
+        return Response({'messages': message_data, 'cursor': latest[1] if latest else None})
 
@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
@@ -6,22 +7,34 @@ from django.db.models import Count, Sum, F, Q
 from django.db.models.functions import TruncDate
 from django.utils import timezone
 import pytz
-from ..models import Message
+from ..models import Message, Channel, DailyRollup
+from ..cache import cache_stats
+from ..deltas import DeltaError, latest_position, parse_since
 
 class MessagesStatsView(APIView):
     permission_classes = [AllowAny]
 
+    @cache_stats
     def get(self, request):
         now = timezone.now()
         last_24_hours = now - timezone.timedelta(hours=24)
+        latest = latest_position()
+        cursor = latest[1] if latest else None
 
-        # Get basic stats using database aggregation
-        basic_stats = Message.objects.aggregate(
-            total_messages=Count('id'),
+        if request.query_params.get('since'):
+            try:
+                since = parse_since(request.query_params['since'])[0]
+            except DeltaError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(self.get_delta(since, last_24_hours, cursor))
+
+        # Get basic stats from the daily rollups, only the last 24 hours needs the messages table
+        basic_stats = DailyRollup.objects.aggregate(
+            total_messages=Sum('message_count'),
             total_words=Sum('word_count'),
-            total_characters=Sum('char_count'),
-            messages_last_24h=Count('id', filter=Q(timestamp__gte=last_24_hours))
+            total_characters=Sum('char_count')
         )
+        basic_stats['messages_last_24h'] = Message.objects.filter(timestamp__gte=last_24_hours).count()
 
         if not basic_stats['total_messages']:
             return Response({
@@ -32,15 +45,14 @@ class MessagesStatsView(APIView):
                 'average_messages_per_day': 0,
                 'most_active_day': None,
                 'least_active_day': None,
-                'daily_messages': []
+                'daily_messages': [],
+                'cursor': cursor
             })
 
-        # Get daily message counts using database aggregation
-        daily_counts = Message.objects.annotate(
-            date=TruncDate('timestamp')
-        ).values('date').annotate(
-            count=Count('id')
-        ).order_by('date')
+        # Get daily message counts from the rollups
+        daily_counts = DailyRollup.objects.values('date').annotate(
+            count=Sum('message_count')
+        ).filter(count__gt=0).order_by('date')
 
         # Convert to list and find most active day
         daily_messages = [
@@ -66,5 +78,30 @@ class MessagesStatsView(APIView):
             'average_messages_per_day': avg_messages,
             'most_active_day': most_active_day,
             'least_active_day': least_active_day,
-            'daily_messages': daily_messages
-        })
\ No newline at end of file
+            'daily_messages': daily_messages,
+            'cursor': cursor
+        })
+
+    def get_delta(self, since, last_24_hours, cursor):
+        """
+        Totals plus the days from ``since`` on, the only ones new messages can change.
+        The totals come from the per-channel counters, so nothing here reads the whole
+        history; clients merge the days by date and derive the summaries themselves.
+        """
+        totals = Channel.objects.aggregate(
+            total_messages=Sum('total_messages'),
+            total_words=Sum('total_words'),
+            total_characters=Sum('total_characters')
+        )
+        daily_counts = DailyRollup.objects.filter(date__gte=since.astimezone(pytz.utc).date()).values('date').annotate(
+            count=Sum('message_count')
+        ).filter(count__gt=0).order_by('date')
+
+        return {
+            'total_messages': totals['total_messages'] or 0,
+            'total_words': totals['total_words'] or 0,
+            'total_characters': totals['total_characters'] or 0,
+            'messages_last_24_hours': Message.objects.filter(timestamp__gte=last_24_hours).count(),
+            'daily_messages': [{'date': item['date'], 'count': item['count']} for item in daily_counts],
+            'cursor': cursor
+        }
\ No newline at end of file
@@ -3,20 +3,22 @@ from django.contrib.auth.models import User
 from rest_framework import generics, viewsets, status
 from ..serializers import UserSerializer, MessageSerializer
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from ..models import Message, DiscordUser, Channel
+from ..models import Message, DiscordUser, Channel, DailyRollup
+from ..cache import cache_stats
+from ..resolvers import Resolver, resolvers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.db import models
-from django.db.models import Count, Sum, F, FloatField, Q
-from django.db.models.functions import Cast
+from django.db.models import Count, Sum, F, FloatField, Q, Window
+from django.db.models.functions import Cast, RowNumber
 import pytz  
-from django.db.models import Prefetch
 
 central_tz = pytz.timezone('America/Chicago') 
 
 class UsersStatsView(APIView):
     permission_classes = [AllowAny]
 
+    @cache_stats
     def get(self, request):
         # Get excluded users from query params
         excluded_users = request.query_params.get('exclude_user', '').split(',')
@@ -29,105 +31,76 @@ class UsersStatsView(APIView):
         # Get bot exclusion parameter
         exclude_bots = request.query_params.get('exclude_bots', '').lower() == 'true'
 
-        # Build channel filter
-        channel_filter = ~Q(messages__channel__name__in=excluded_channels) if excluded_channels else Q()
-        
-        # Add bot filter and user exclusion filter
-        base_query = DiscordUser.objects
+        # Exclusions accept IDs or names, and filter on the foreign keys
+        resolve = resolvers()
+
+        # Aggregate the daily rollups per user with the same exclusions
+        rollups = DailyRollup.objects.all()
+        if excluded_channels:
+            rollups = rollups.exclude(channel_id__in=resolve['channel'].resolve(excluded_channels))
         if exclude_bots:
-            base_query = base_query.filter(is_bot=False)
+            rollups = rollups.filter(is_bot=False)
         if excluded_users:
-            base_query = base_query.exclude(name__in=excluded_users)
+            rollups = rollups.exclude(author_id__in=resolve['user'].resolve(excluded_users))
 
         user_stats = (
-            base_query
-            .prefetch_related(
-                Prefetch(
-                    'messages',
-                    queryset=Message.objects.select_related('channel')
-                )
+            rollups
+            .order_by()
+            .values(
+                'author_id',
+                'is_bot',
+                name=F('author__name'),
+                nickname=F('author__nickname'),
             )
             .annotate(
-                filtered_total_messages=Count(
-                    'messages',
-                    filter=channel_filter,
-                    distinct=True
-                ),
-                filtered_total_words=Sum(
-                    'messages__word_count',
-                    filter=channel_filter
-                ),
-                filtered_total_characters=Sum(
-                    'messages__char_count',
-                    filter=channel_filter
-                ),
-                attachments_count=Count(
-                    'messages',
-                    filter=~Q(messages__attachments=[]) & channel_filter,
-                    distinct=True
-                ),
-                mentions_count=Count(
-                    'messages',
-                    filter=~Q(messages__mentions=[]) & channel_filter,
-                    distinct=True
-                ),
-                emoji_count=Count(
-                    'messages',
-                    filter=~Q(messages__inline_emojis=[]) & channel_filter,
-                    distinct=True
-                )
-            )
-            .values(
-                'name',
-                'nickname',
-                'is_bot',  # Add is_bot field
-                'filtered_total_messages',
-                'filtered_total_words',
-                'filtered_total_characters',
-                'attachments_count',
-                'mentions_count',
-                'emoji_count'
+                filtered_total_messages=Sum('message_count'),
+                filtered_total_words=Sum('word_count'),
+                filtered_total_characters=Sum('char_count'),
+                attachments_count=Sum('attachment_count'),
+                mentions_count=Sum('mention_count'),
+                emoji_count=Sum('emoji_count')
             )
         )
 
-        # Update total stats query to match all exclusions
-        total_stats_filter = Q()
-        if excluded_channels:
-            total_stats_filter &= ~Q(channel__name__in=excluded_channels)
-        if exclude_bots:
-            total_stats_filter &= ~Q(author__is_bot=True)
-        if excluded_users:  # Add this block
-            total_stats_filter &= ~Q(author__name__in=excluded_users)
-
-        total_stats = (
-            Message.objects
-            .filter(total_stats_filter)
-            .aggregate(
-                total_messages=Count('id'),
-                total_words=Sum('word_count'),
-                total_characters=Sum('char_count')
+        total_stats = rollups.aggregate(
+            total_messages=Sum('message_count'),
+            total_words=Sum('word_count'),
+            total_characters=Sum('char_count')
+        )
+        total_stats['total_messages'] = total_stats['total_messages'] or 0
+
+        # Every user's most active channel from one ranked query, grouped on the channel ID
+        # so same named channels in different guilds stay apart
+        most_active = {
+            row['author_id']: row
+            for row in (
+                rollups
+                .order_by()
+                .values('author_id', 'channel_id')
+                .annotate(count=Sum('message_count'))
+                .annotate(rank=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=[F('count').desc(), F('channel_id').asc()]
+                ))
+                .filter(rank=1)
             )
+        }
+        channel_names = dict(
+            Channel.objects
+            .filter(pk__in=[row['channel_id'] for row in most_active.values()])
+            .values_list('pk', 'name')
         )
 
         results = []
         for user in user_stats:
-            if user['filtered_total_messages'] == 0:
+            if not user['filtered_total_messages']:
                 continue
 
-            # Get most active channel in a single efficient query
-            channel_stats = (
-                Message.objects
-                .filter(author__name=user['name'])
-                .exclude(channel__name__in=excluded_channels if excluded_channels else [])
-                .values('channel__name')
-                .annotate(count=Count('id'))
-                .order_by('-count')
-                .first()
-            )
-
-            if channel_stats:
+            channel_stats = most_active.get(user['author_id'])
+            if channel_stats and channel_stats['count']:
                 channel_percentage = (channel_stats['count'] / user['filtered_total_messages']) * 100
-                most_active_channel = channel_stats['channel__name']
+                most_active_channel = channel_names.get(channel_stats['channel_id'], 'unknown')
             else:
                 channel_percentage = 0
                 most_active_channel = 'unknown'
@@ -157,7 +130,7 @@ class UserMessageSums(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, username):
-        stats = Message.objects.filter(user_name=username).aggregate(
+        stats = Message.objects.filter(author_id__in=Resolver(DiscordUser).resolve([username])).aggregate(
             total_messages=models.Count('id'),
             total_characters=models.Sum('char_count'),
             total_words=models.Sum('word_count')
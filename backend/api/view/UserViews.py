@@ -4,6 +4,8 @@ from rest_framework import generics, viewsets, status
 from ..serializers import UserSerializer, MessageSerializer
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from ..models import Message, DiscordUser
+from ..cache import bump_generation
+from ..resolvers import Resolver
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.db import models
@@ -54,7 +56,7 @@ class DiscordUserDetailView(APIView):
             # Efficiently fetch user and roles in a single query
             user = (DiscordUser.objects
                    .prefetch_related('roles')
-                   .get(name=username))
+                   .get(pk=Resolver(DiscordUser).resolve_one(username)))
             
             roles = user.roles.values('id', 'name', 'color', 'position')
 
@@ -79,13 +81,14 @@ class DiscordUserDetailView(APIView):
 
     def patch(self, request, username):
         try:
-            user = DiscordUser.objects.get(name=username)
+            user = DiscordUser.objects.get(pk=Resolver(DiscordUser).resolve_one(username))
             # Only allow updating certain fields
             allowed_fields = ['nickname', 'avatar_url', 'color']
             for field in allowed_fields:
                 if field in request.data:
                     setattr(user, field, request.data[field])
             user.save()
+            bump_generation()
             
             return Response({
                 'id': user.id,
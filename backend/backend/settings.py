@@ -15,6 +15,7 @@ from datetime import timedelta
 from dotenv import load_dotenv
 import os
 import re
+from importlib.util import find_spec
 
 load_dotenv()
 
@@ -61,6 +62,11 @@ INSTALLED_APPS = [
     "corsheaders",
 ]
 
+# daphne makes runserver serve backend/asgi.py, which the live feed needs. Only the
+# web server installs it; the bot loads these settings too and must not require it
+if find_spec("daphne"):
+    INSTALLED_APPS.insert(0, "daphne")
+
 def get_urls_from_config():
     config_path = Path(__file__).resolve().parent / 'config.js'
     urls = {
@@ -119,6 +125,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "backend.wsgi.application"
+ASGI_APPLICATION = "backend.asgi.application"
 
 
 # Database
@@ -143,6 +150,47 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# STATS_CACHE_BACKEND picks locmem (per process), file or redis, STATS_CACHE_LOCATION
+# is the directory or redis:// URL for the latter two
+
+STATS_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'statbot-stats'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'stats_cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://localhost:6379/0'),
+}
+STATS_CACHE_BACKEND, STATS_CACHE_DEFAULT_LOCATION = STATS_CACHE_BACKENDS[os.getenv('STATS_CACHE_BACKEND', 'locmem')]
+
+CACHES = {
+    'default': {
+        'BACKEND': STATS_CACHE_BACKEND,
+        'LOCATION': os.getenv('STATS_CACHE_LOCATION', STATS_CACHE_DEFAULT_LOCATION),
+    }
+}
+
+# Seconds a cached stats response may be served before time based values are recomputed,
+# new messages invalidate it immediately. 0 keeps responses until the next write
+STATS_CACHE_TIMEOUT = int(os.getenv('STATS_CACHE_TIMEOUT', 60))
+
+# Days of per minute message counts kept for the timeline, older data is served per hour
+MINUTE_ROLLUP_RETENTION_DAYS = int(os.getenv('MINUTE_ROLLUP_RETENTION_DAYS', 7))
+
+# Days a reply waits for its parent message to be stored before it is left unlinked
+PENDING_REFERENCE_RETENTION_DAYS = int(os.getenv('PENDING_REFERENCE_RETENTION_DAYS', 30))
+
+# Characters bot commands start with, for Message.is_command. Prefixes that also start
+# ordinary words (".net", "-ok") would count those as commands
+COMMAND_PREFIXES = os.getenv('COMMAND_PREFIXES', '!/$')
+
+# Live feed: seconds between checks for new messages while anyone is subscribed,
+# messages buffered per connection before a slow client is told to resync, and
+# seconds a stream stays open before the client reconnects
+LIVE_POLL_INTERVAL = float(os.getenv('LIVE_POLL_INTERVAL', 1))
+LIVE_MAX_PENDING_MESSAGES = int(os.getenv('LIVE_MAX_PENDING_MESSAGES', 100))
+LIVE_MAX_CONNECTION_SECONDS = int(os.getenv('LIVE_MAX_CONNECTION_SECONDS', 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -213,8 +261,9 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
 
 # Add these additional CORS settings
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'ETag']
 CORS_PREFLIGHT_MAX_AGE = 86400  # 24 hours
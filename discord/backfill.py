@@ -0,0 +1,105 @@
+import django_setup  # This must be the first import
+import asyncio
+import os
+import time
+import discord
+from asgiref.sync import sync_to_async
+from api.ingest import store_backfill_page
+from api.models import BackfillCheckpoint
+from entity_cache import entity_cache
+from on_message import build_message_record
+
+
+class BackfillEngine:
+    """
+    Archives the history of every text channel in a guild over [start, end).
+
+    Channels are fetched concurrently, bounded by ``concurrency``. discord.py already
+    queues requests per rate-limit bucket (channel history buckets are per channel)
+    and retries 429s, so the semaphore only keeps us well inside the global limit.
+    Every stored page advances a BackfillCheckpoint, so re-running the same range
+    resumes each channel after its last stored message and skips finished channels.
+    """
+
+    def __init__(self, guild, start, end, concurrency=4, page_size=500, restart=False):
+        self.guild = guild
+        self.start = start
+        self.end = end
+        self.page_size = page_size
+        self.restart = restart
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stats = {
+            'channels': 0,
+            'resumed': 0,
+            'skipped': 0,
+            'forbidden': 0,
+            'messages': 0,
+            'errors': [],
+        }
+
+    @classmethod
+    def from_env(cls, guild, start, end, **kwargs):
+        kwargs.setdefault('concurrency', int(os.getenv('BACKFILL_CONCURRENCY', 4)))
+        kwargs.setdefault('page_size', int(os.getenv('BACKFILL_PAGE_SIZE', 500)))
+        return cls(guild, start, end, **kwargs)
+
+    async def run(self):
+        started = time.monotonic()
+        channels = [c for c in self.guild.channels if isinstance(c, discord.TextChannel)]
+        await asyncio.gather(*(self._backfill_channel(channel) for channel in channels))
+        self.stats['elapsed'] = time.monotonic() - started
+        return self.stats
+
+    def _get_checkpoint(self, channel_id):
+        checkpoint, _ = BackfillCheckpoint.objects.get_or_create(
+            channel_id=channel_id,
+            range_start=self.start,
+            range_end=self.end
+        )
+        if self.restart:
+            checkpoint.last_message_id = None
+            checkpoint.messages_stored = 0
+            checkpoint.completed = False
+            checkpoint.save()
+        return checkpoint
+
+    async def _store_page(self, checkpoint, records):
+        result = await sync_to_async(store_backfill_page)(checkpoint.pk, records, cache=entity_cache)
+        self.stats['messages'] += result['inserted']
+
+    async def _backfill_channel(self, channel):
+        async with self.semaphore:
+            checkpoint = await sync_to_async(self._get_checkpoint)(str(channel.id))
+            if checkpoint.completed:
+                self.stats['skipped'] += 1
+                return
+
+            self.stats['channels'] += 1
+            after = self.start
+            if checkpoint.last_message_id:
+                self.stats['resumed'] += 1
+                after = discord.Object(id=int(checkpoint.last_message_id))
+
+            records = []
+            try:
+                async for message in channel.history(
+                    after=after,
+                    before=self.end,
+                    limit=None,
+                    oldest_first=True
+                ):
+                    records.append(await build_message_record(message))
+                    if len(records) >= self.page_size:
+                        await self._store_page(checkpoint, records)
+                        records = []
+
+                if records:
+                    await self._store_page(checkpoint, records)
+                checkpoint.completed = True
+                await sync_to_async(checkpoint.save)(update_fields=['completed', 'updated_at'])
+
+            except discord.Forbidden:
+                self.stats['forbidden'] += 1
+            except Exception as e:
+                self.stats['errors'].append(f"Error processing channel {channel.name}: {str(e)}")
+                print(f"Error processing channel {channel.name}: {str(e)}")
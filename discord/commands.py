@@ -4,6 +4,8 @@ from discord.ext import commands
 from asgiref.sync import sync_to_async
 from api.models import Message
 from django.db.models import Avg, Sum, Count
+from ingest_queue import ingest_queue
+from entity_cache import entity_cache
 import logging
 
 # Set up logging
@@ -36,5 +38,22 @@ class StatCommands(commands.Cog):
         print(stats_message)
         await interaction.response.send_message(stats_message)
 
+    @app_commands.command(name="ingest_status", description="View live ingestion queue metrics")
+    async def ingest_status(self, interaction: discord.Interaction):
+        metrics = ingest_queue.metrics()
+
+        msg = "📥 **Ingestion Queue**\n\n"
+        msg += f"Queued: `{metrics['queued']:,}` / `{metrics['max_size']:,}` (peak `{metrics['high_water']:,}`)\n"
+        msg += f"Enqueued: `{metrics['enqueued']:,}`\n"
+        msg += f"Stored: `{metrics['stored']:,}` (skipped `{metrics['skipped']:,}`, failed `{metrics['failed']:,}`)\n"
+        msg += f"Batches: `{metrics['batches']:,}`\n"
+        msg += f"Flush Time: `{metrics['last_flush_ms']:.1f} ms` last, `{metrics['avg_flush_ms']:.1f} ms` avg\n"
+        msg += f"Blocked Enqueues: `{metrics['blocked_puts']:,}`\n"
+
+        cache = entity_cache.metrics()
+        msg += f"Entity Cache: `{cache['size']:,}` / `{cache['max_size']:,}` entries, `{cache['hit_rate']:.1%}` hit rate"
+
+        await interaction.response.send_message(msg, ephemeral=True)
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(StatCommands(bot))
\ No newline at end of file
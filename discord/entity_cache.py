@@ -0,0 +1,63 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class EntityCache:
+    """
+    Bounded LRU of the last written fingerprint per guild/channel/user/role.
+
+    Passed to api.ingest.store_batch so metadata that has not changed since
+    it was last written is not upserted again on every message.
+    """
+
+    def __init__(self, max_size=50000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        # store_batch runs in a sync_to_async worker thread
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_size=int(os.getenv('ENTITY_CACHE_SIZE', 50000)))
+
+    def unchanged(self, kind, pk, fingerprint):
+        key = (kind, str(pk))
+        with self._lock:
+            if self._entries.get(key) == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def remember(self, kind, pk, fingerprint):
+        key = (kind, str(pk))
+        with self._lock:
+            self._entries[key] = fingerprint
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind, pk):
+        with self._lock:
+            self._entries.pop((kind, str(pk)), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+entity_cache = EntityCache.from_env()
@@ -0,0 +1,135 @@
+import django_setup  # This must be the first import
+import asyncio
+import os
+import time
+import traceback
+from asgiref.sync import sync_to_async
+from api.ingest import store_batch
+from entity_cache import entity_cache
+
+
+class IngestQueue:
+    """Buffers live message records and writes them to the database in batches"""
+
+    def __init__(self, batch_size=200, flush_interval=0.5, max_size=10000, cache=None):
+        self.batch_size = batch_size
+        self.cache = cache
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.queue = None
+        self._task = None
+        self._inflight = None
+        self._pending = []
+        self.stats = {
+            'enqueued': 0,
+            'stored': 0,
+            'skipped': 0,
+            'failed': 0,
+            'batches': 0,
+            'blocked_puts': 0,
+            'high_water': 0,
+            'last_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            batch_size=int(os.getenv('INGEST_BATCH_SIZE', 200)),
+            flush_interval=int(os.getenv('INGEST_FLUSH_MS', 500)) / 1000,
+            max_size=int(os.getenv('INGEST_QUEUE_SIZE', 10000)),
+            cache=entity_cache,
+        )
+
+    async def start(self):
+        if self._task:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, record):
+        # A full queue blocks the caller, which pushes back on the gateway reader
+        if self.queue.full():
+            self.stats['blocked_puts'] += 1
+        await self.queue.put(record)
+        self.stats['enqueued'] += 1
+        self.stats['high_water'] = max(self.stats['high_water'], self.queue.qsize())
+
+    async def stop(self):
+        """Stop the flusher and write out everything still buffered"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Let a write that was already running finish before draining the rest
+        if self._inflight:
+            await self._inflight
+
+        batch, self._pending = self._pending, []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            try:
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Hand the partly collected batch to stop()
+                self._pending = batch
+                raise
+
+            # Shield the write so a shutdown cancel can't abandon a batch half way
+            self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    async def _flush(self, batch):
+        started = time.monotonic()
+        try:
+            result = await sync_to_async(store_batch)(batch, cache=self.cache)
+            self.stats['stored'] += result['inserted']
+            self.stats['skipped'] += result['skipped']
+            print(f"Flushed {len(batch)} messages ({result['inserted']} new, {self.queue.qsize()} queued)")
+        except Exception as e:
+            self.stats['failed'] += len(batch)
+            # A cached row may have been removed behind our back, so stop trusting the cache
+            if self.cache:
+                self.cache.clear()
+            print(f"Error flushing {len(batch)} messages: {str(e)}")
+            print(traceback.format_exc())
+        finally:
+            elapsed = (time.monotonic() - started) * 1000
+            self.stats['batches'] += 1
+            self.stats['last_flush_ms'] = elapsed
+            self.stats['total_flush_ms'] += elapsed
+
+    def metrics(self):
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'queued': self.queue.qsize() if self.queue else 0,
+            'max_size': self.max_size,
+            'avg_flush_ms': self.stats['total_flush_ms'] / batches if batches else 0.0,
+        }
+
+
+ingest_queue = IngestQueue.from_env()
@@ -3,8 +3,14 @@ from typing import Final
 import discord
 import os
 from dotenv import load_dotenv
-from discord.ext import commands
+from asgiref.sync import sync_to_async
+from discord.ext import commands, tasks
 from on_message import handle_message
+from ingest_queue import ingest_queue
+from entity_cache import entity_cache
+from api.average_message import refresh_snapshot
+from api.rollups import prune_minute_rollups
+from api.ingest import prune_pending_references
 from functions import (
     get_or_create_discord_user_sync,
     insert_message_sync,
@@ -19,7 +25,32 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class StatBot(commands.Bot):
+    async def setup_hook(self):
+        await ingest_queue.start()
+        self.prune_rollups.start()
+        self.refresh_average_message.start()
+
+    async def close(self):
+        self.prune_rollups.cancel()
+        self.refresh_average_message.cancel()
+        # Write out buffered messages before the connection goes away
+        await ingest_queue.stop()
+        await super().close()
+
+    @tasks.loop(hours=1)
+    async def prune_rollups(self):
+        # Minute buckets are only kept for MINUTE_ROLLUP_RETENTION_DAYS, older ranges use the hourly ones
+        await sync_to_async(prune_minute_rollups)()
+        # Replies whose parent never arrived stop waiting after PENDING_REFERENCE_RETENTION_DAYS
+        await sync_to_async(prune_pending_references)()
+
+    @tasks.loop(minutes=10)
+    async def refresh_average_message(self):
+        # Off the request path: folds in every message stored since the last run, backfills included
+        await sync_to_async(refresh_snapshot)()
+
+bot = StatBot(command_prefix="!", intents=intents)
 
 @bot.event
 async def on_ready():
@@ -37,6 +68,27 @@ async def on_ready():
 async def on_message(message):
     await handle_message(message, bot)
 
+# Metadata changes invalidate the entity cache so the next message rewrites them
+@bot.event
+async def on_guild_update(before, after):
+    entity_cache.invalidate('guild', after.id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    entity_cache.invalidate('channel', after.id)
+
+@bot.event
+async def on_member_update(before, after):
+    entity_cache.invalidate('user', after.id)
+
+@bot.event
+async def on_user_update(before, after):
+    entity_cache.invalidate('user', after.id)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    entity_cache.invalidate('role', after.id)
+
 if __name__ == "__main__":
     if not TOKEN:
         raise ValueError("No token found. Check your .env file")
@@ -28,6 +28,7 @@ const Database = () => {
           hasAttachment: false,
           hasMention: false,
           hasEmoji: false,
+          search: "",
         };
   });
   const [filterOptions, setFilterOptions] = useState({
@@ -546,6 +547,7 @@ const Database = () => {
       if (filters.hasAttachment) url += "&has_attachment=true";
       if (filters.hasMention) url += "&has_mention=true";
       if (filters.hasEmoji) url += "&has_emoji=true";
+      if (filters.search) url += `&q=${encodeURIComponent(filters.search)}`;
       const response = await api.get(url);
       setMessages(response.data.results);
       setHasMore(response.data.next !== null);
@@ -717,6 +719,17 @@ const Database = () => {
               ))}
             </select>
           </div>
+          <div className="filter-select">
+            <label>Search:</label>
+            <input
+              type="text"
+              value={filters.search || ""}
+              placeholder='words, "a phrase", -exclude'
+              onChange={(e) =>
+                setFilters((f) => ({ ...f, search: e.target.value }))
+              }
+            />
+          </div>
           <div className="filter-select">
             <label>Date:</label>
             <input
@@ -1,13 +1,18 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useAuth } from "../components/AuthContext";
 import { useNavigate } from "react-router-dom";
 import Graph from "../components/Graph";
 import api from "../api";
 import "../styles/Home.css";
 import {
+  applyTimelineBuckets,
   calculateAvgCharsPerMessage,
+  expandTimeline,
   formatNumber,
   handleCopyWithToast,
+  mergeDailyMessages,
+  mergeTimeline,
+  summarizeDailyMessages,
 } from "../utils.js";
 import LoadingIndicator from "../components/LoadingIndicator";
 import { useRefresh } from "../components/RefreshContext";
@@ -31,6 +36,11 @@ function Home() {
   const [messageStats, setMessageStats] = useState(null);
   const { autoRefresh, refreshInterval } = useRefresh();
   const [toast, setToast] = useState(null);
+  // Last message each endpoint reported plus the data it was merged into, so
+  // polls only fetch what changed since
+  const cursors = useRef({});
+  const loaded = useRef({ dailyMessages: [], timeline: [], recentMessages: [] });
+  const live = useRef(false);
 
   const formatTimeRange = (timestamp) => {
     if (!timestamp) return "N/A";
@@ -62,34 +72,70 @@ function Home() {
   useEffect(() => {
     document.title = CONFIG.title;
 
+    const withSince = (url, key) =>
+      cursors.current[key]
+        ? `${url}${url.includes("?") ? "&" : "?"}since=${encodeURIComponent(cursors.current[key])}`
+        : url;
+
+    function applyStats(stats, changedDays, merge) {
+      const data = loaded.current;
+      data.dailyMessages = merge
+        ? mergeDailyMessages(data.dailyMessages, changedDays)
+        : changedDays;
+      const summary = summarizeDailyMessages(data.dailyMessages, stats.total_messages);
+      setMessageStats({ ...stats, ...summary, daily_messages: data.dailyMessages });
+      setDailyMessages(data.dailyMessages);
+      setAvgMessagesPerDay(summary.average_messages_per_day);
+      setMessagesLast24Hours(stats.messages_last_24_hours);
+      setTotalMessages(stats.total_messages);
+      setTotalWords(stats.total_words);
+      setTotalCharacters(stats.total_characters);
+    }
+
+    function addRecentMessages(messages, merge) {
+      // New messages go on top, skipping any already shown
+      const data = loaded.current;
+      const seen = new Set(messages.map((msg) => msg.id));
+      data.recentMessages = merge
+        ? messages
+            .concat(data.recentMessages.filter((msg) => !seen.has(msg.id)))
+            .slice(0, 75)
+        : messages;
+      setRecentMessages(data.recentMessages);
+    }
+
     async function fetchData() {
       try {
         const [messageStats, graphTimeline, recentMessages] = await Promise.all(
           [
-            api.get("/api/stats/message-stats"),
-            api.get("/api/stats/message-timeline"),
-            api.get("/api/stats/recent-messages"),
+            api.get(withSince("/api/stats/message-stats/", "stats")),
+            api.get(withSince("/api/stats/message-timeline/?window=24h&resolution=minute", "timeline")),
+            api.get(withSince("/api/stats/recent-messages/", "recent")),
           ]
         );
+        const data = loaded.current;
 
         if (messageStats.data) {
-          setMessageStats(messageStats.data);
-          setDailyMessages(messageStats.data.daily_messages);
-          setAvgMessagesPerDay(messageStats.data.average_messages_per_day);
-          setMessagesLast24Hours(messageStats.data.messages_last_24_hours);
-          setTotalMessages(messageStats.data.total_messages);
-          setTotalWords(messageStats.data.total_words);
-          setTotalCharacters(messageStats.data.total_characters);
+          const stats = messageStats.data;
+          applyStats(stats, stats.daily_messages, !!cursors.current.stats);
+          cursors.current.stats = stats.cursor;
         }
 
         if (graphTimeline.data) {
-          setTimelineData(graphTimeline.data.intervals);
+          data.timeline = cursors.current.timeline
+            ? mergeTimeline(data.timeline, graphTimeline.data)
+            : expandTimeline(graphTimeline.data);
+          setTimelineData(data.timeline);
+          cursors.current.timeline = graphTimeline.data.cursor;
         }
 
         if (recentMessages.data) {
-          setRecentMessages(recentMessages.data.messages);
+          addRecentMessages(recentMessages.data.messages, !!cursors.current.recent);
+          cursors.current.recent = recentMessages.data.cursor;
         }
       } catch (error) {
+        // Start over with full responses, e.g. when the cursor message was deleted
+        cursors.current = {};
         setError(error.message);
       } finally {
         setIsLoading(false);
@@ -98,13 +144,49 @@ function Home() {
 
     fetchData();
     let intervalId;
+    let source;
+
+    if (autoRefresh && window.EventSource) {
+      // Pushed updates replace polling while the live feed is connected
+      source = new EventSource(`${CONFIG.apiUrl}/api/live/`, { withCredentials: true });
+      source.onopen = () => {
+        live.current = true;
+      };
+      source.onerror = () => {
+        // EventSource reconnects by itself, polling fills the gap meanwhile
+        live.current = false;
+      };
+      source.addEventListener("message", (event) => {
+        const msg = JSON.parse(event.data);
+        addRecentMessages([msg], true);
+        cursors.current.recent = msg.id;
+      });
+      source.addEventListener("stats", (event) => {
+        const stats = JSON.parse(event.data);
+        applyStats(stats, [stats.today], true);
+      });
+      source.addEventListener("timeline", (event) => {
+        const data = loaded.current;
+        data.timeline = applyTimelineBuckets(data.timeline, JSON.parse(event.data));
+        setTimelineData(data.timeline);
+      });
+      source.addEventListener("resync", () => {
+        // This client fell behind and missed messages, start over
+        cursors.current = {};
+        fetchData();
+      });
+    }
 
     if (autoRefresh) {
-      intervalId = setInterval(fetchData, refreshInterval);
+      intervalId = setInterval(() => {
+        if (!live.current) fetchData();
+      }, refreshInterval);
     }
 
     return () => {
       if (intervalId) clearInterval(intervalId);
+      if (source) source.close();
+      live.current = false;
     };
   }, [autoRefresh, refreshInterval]);
 
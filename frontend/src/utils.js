@@ -70,4 +70,63 @@ export const handleCopyWithToast = (value, raw = false, setToast) => {
         setToast('Failed to copy');
         setTimeout(() => setToast(null), 3000);
     });
-};
\ No newline at end of file
+};
+// Expand a compact timeline response ({start, step, counts}) into [{timestamp, count}]
+export const expandTimeline = ({ start, step, counts }) => {
+    const first = new Date(start).getTime();
+    return counts.map((count, i) => ({
+        timestamp: new Date(first + i * step * 1000).toISOString(),
+        count
+    }));
+};
+
+// Apply a ?since= timeline response: buckets from delta.start on are replaced,
+// buckets that slid out of the window are dropped
+export const mergeTimeline = (previous, delta) => {
+    const windowStart = new Date(delta.window_start).getTime();
+    const deltaStart = new Date(delta.start).getTime();
+    const kept = previous.filter(interval => {
+        const time = new Date(interval.timestamp).getTime();
+        return time >= windowStart && time < deltaStart;
+    });
+    return kept.concat(expandTimeline(delta));
+};
+
+// Replace the changed days of a daily_messages list, keeping it sorted by date
+export const mergeDailyMessages = (previous, changed) => {
+    const byDate = {};
+    previous.forEach(day => { byDate[day.date] = day; });
+    changed.forEach(day => { byDate[day.date] = day; });
+    return Object.values(byDate).sort((a, b) => a.date.localeCompare(b.date));
+};
+
+// Same summaries message-stats returns, derived from a merged daily_messages list
+export const summarizeDailyMessages = (dailyMessages, totalMessages) => {
+    if (!dailyMessages.length) {
+        return { average_messages_per_day: 0, most_active_day: null, least_active_day: null };
+    }
+    // The first and last day are usually partial, leave them out of the average
+    const middleDays = dailyMessages.length > 2 ? dailyMessages.slice(1, -1) : null;
+    const average = middleDays
+        ? middleDays.reduce((sum, day) => sum + day.count, 0) / middleDays.length
+        : totalMessages / dailyMessages.length;
+    return {
+        average_messages_per_day: average,
+        most_active_day: dailyMessages.reduce((a, b) => (b.count > a.count ? b : a)),
+        least_active_day: dailyMessages.reduce((a, b) => (b.count < a.count ? b : a))
+    };
+};
+
+// Apply live feed minute buckets ({isoStart: count}) to a [{timestamp, count}] timeline,
+// dropping buckets that fell out of its window
+export const applyTimelineBuckets = (timeline, buckets, windowMs = 24 * 60 * 60 * 1000) => {
+    const byTime = {};
+    timeline.forEach(interval => { byTime[new Date(interval.timestamp).getTime()] = interval; });
+    Object.entries(buckets).forEach(([start, count]) => {
+        const time = new Date(start).getTime();
+        byTime[time] = { timestamp: new Date(time).toISOString(), count };
+    });
+    const times = Object.keys(byTime).map(Number).sort((a, b) => a - b);
+    const cutoff = times[times.length - 1] - windowMs;
+    return times.filter(time => time >= cutoff).map(time => byTime[time]);
+};